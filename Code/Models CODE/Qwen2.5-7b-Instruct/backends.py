@@ -0,0 +1,249 @@
+"""Inference backends behind the runner's classify step.
+
+Every backend takes a prompt builder (description -> (system_prompt, user_prompt))
+and a list of excerpts, and returns (label, raw_output) pairs in input order.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bias_inference import (
+    bias_classes, render_prompt, parse_prediction, classify_bias_batch, score_bias_batch, PromptTemplate
+)
+from response_cache import ResponseCache
+
+PromptBuilder = Callable[[str], Tuple[str, str]]
+
+class InferenceBackend:
+    name = "base"
+
+    def classify_batch(self, build_messages: PromptBuilder, descriptions: List[str]) -> List[Tuple[str, str]]:
+        raise NotImplementedError
+
+    def score_batch(self, build_messages: PromptBuilder, descriptions: List[str]) -> List[Tuple[str, Dict[str, float]]]:
+        raise NotImplementedError(f"The {self.name} backend does not support label scoring")
+
+    def close(self):
+        pass
+
+class HFBackend(InferenceBackend):
+    """Local transformers model, batched by prompt length with an optional prefix KV cache.
+
+    With a response_cache, rows whose prompt tokens were already answered under the
+    same model, revision and decoding settings are served from disk.
+    """
+    name = "hf"
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        bucket_size: int = 16,
+        max_new_tokens: int = 10,
+        use_prefix_cache: bool = True,
+        response_cache: Optional[ResponseCache] = None,
+        constrain_labels: bool = False,
+        max_batch_tokens: Optional[int] = None
+    ):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.bucket_size = bucket_size
+        self.max_new_tokens = max_new_tokens
+        self.use_prefix_cache = use_prefix_cache
+        self.response_cache = response_cache
+        self.constrain_labels = constrain_labels
+        self.max_batch_tokens = max_batch_tokens
+        self._templates = {}
+        self._prefix_caches = {}
+
+    def template(self, build_messages: PromptBuilder) -> PromptTemplate:
+        # Render and tokenize each prompt template once, the first time it is used
+        if build_messages not in self._templates:
+            def build_prompt(description):
+                return render_prompt(self.tokenizer, *build_messages(description))
+            self._templates[build_messages] = PromptTemplate(self.tokenizer, build_prompt)
+        return self._templates[build_messages]
+
+    def encode(self, build_messages: PromptBuilder, descriptions: List[str]):
+        template = self.template(build_messages)
+        if not self.use_prefix_cache:
+            return template.encode(descriptions), None
+        if build_messages not in self._prefix_caches:
+            self._prefix_caches[build_messages] = template.prefix_cache(self.model)
+        return template.encode(descriptions, include_prefix=False), self._prefix_caches[build_messages]
+
+    def cached(self, kind: str, encoded, prefix_cache, compute):
+        """Serve rows from the response cache and run compute() only on the misses."""
+        if self.response_cache is None:
+            return compute(encoded)
+        namespace = ResponseCache.namespace(
+            model=self.model.config._name_or_path,
+            revision=getattr(self.model.config, "_commit_hash", None),
+            dtype=self.model.dtype,
+            kind=kind,
+            max_new_tokens=self.max_new_tokens if kind == "generate" else None,
+            constrain_labels=self.constrain_labels if kind == "generate" else None,
+            do_sample=False
+        )
+        prefix_ids = prefix_cache.prefix_ids if prefix_cache is not None else []
+        keys = ResponseCache.keys_for(namespace, prefix_ids, encoded)
+        found = self.response_cache.get_many(keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            computed = compute([encoded[i] for i in missing])
+            new_items = {keys[i]: result for i, result in zip(missing, computed)}
+            self.response_cache.put_many(new_items)
+            found.update(new_items)
+        return [found[key] for key in keys]
+
+    def classify_batch(self, build_messages, descriptions):
+        encoded, prefix_cache = self.encode(build_messages, descriptions)
+        return self.cached("generate", encoded, prefix_cache, lambda rows: classify_bias_batch(
+            self.model, self.tokenizer, rows,
+            bucket_size=self.bucket_size,
+            max_new_tokens=self.max_new_tokens,
+            prefix_cache=prefix_cache,
+            constrain_labels=self.constrain_labels,
+            max_batch_tokens=self.max_batch_tokens
+        ))
+
+    def score_batch(self, build_messages, descriptions):
+        encoded, prefix_cache = self.encode(build_messages, descriptions)
+        return self.cached("score", encoded, prefix_cache, lambda rows: score_bias_batch(
+            self.model, self.tokenizer, rows,
+            bucket_size=self.bucket_size,
+            prefix_cache=prefix_cache,
+            max_batch_tokens=self.max_batch_tokens
+        ))
+
+    def close(self):
+        if self.response_cache is not None:
+            stats = self.response_cache.stats()
+            print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.1%}), {stats['entries']} entries")
+            self.response_cache.close()
+
+class StubBackend(InferenceBackend):
+    """Deterministic in-process backend for CPU-only smoke runs and harness throughput tests.
+
+    The label is a hash of the full prompt, so reruns give identical results; latency
+    adds a fixed per-row sleep to imitate a model.
+    """
+    name = "stub"
+
+    def __init__(self, seed: int = 0, latency: float = 0.0):
+        self.seed = seed
+        self.latency = latency
+
+    def _digest(self, build_messages, description) -> bytes:
+        system_prompt, user_prompt = build_messages(description)
+        return hashlib.sha1(f"{self.seed}\0{system_prompt}\0{user_prompt}".encode("utf-8")).digest()
+
+    def classify_batch(self, build_messages, descriptions):
+        if self.latency:
+            time.sleep(self.latency * len(descriptions))
+        labels = [bias_classes[self._digest(build_messages, d)[0] % len(bias_classes)] for d in descriptions]
+        return [(label, label) for label in labels]
+
+    def score_batch(self, build_messages, descriptions):
+        if self.latency:
+            time.sleep(self.latency * len(descriptions))
+        results = []
+        for d in descriptions:
+            weights = [b + 1 for b in self._digest(build_messages, d)[:len(bias_classes)]]
+            probs = [w / sum(weights) for w in weights]
+            best = max(range(len(bias_classes)), key=lambda j: probs[j])
+            results.append((bias_classes[best], dict(zip(bias_classes, probs))))
+        return results
+
+class OpenAIHTTPBackend(InferenceBackend):
+    """Asyncio client for a local OpenAI-compatible chat completions server (vLLM, llama.cpp, ...).
+
+    Requests share one pooled aiohttp session across batches, and at most
+    max_in_flight of them are outstanding at any time. The client runs its own event
+    loop on a background thread, so it also works where a loop is already running
+    (Colab, Jupyter).
+    """
+    name = "http"
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000/v1",
+        model: str = "Qwen/Qwen2.5-7B-Instruct",
+        max_in_flight: int = 64,
+        max_new_tokens: int = 10,
+        timeout: float = 120.0,
+        max_retries: int = 3,
+        api_key: Optional[str] = None
+    ):
+        import aiohttp  # only needed for this backend
+        self._aiohttp = aiohttp
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.max_new_tokens = max_new_tokens
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.api_key = api_key
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._session = None
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _ensure_session(self):
+        if self._session is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+            self._session = self._aiohttp.ClientSession(
+                connector=self._aiohttp.TCPConnector(limit=self.max_in_flight),
+                timeout=self._aiohttp.ClientTimeout(total=self.timeout),
+                headers=headers
+            )
+
+    async def _complete(self, semaphore, system_prompt, user_prompt) -> str:
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "max_tokens": self.max_new_tokens,
+            "temperature": 0
+        }
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with self._session.post(f"{self.base_url}/chat/completions", json=payload) as response:
+                        response.raise_for_status()
+                        data = await response.json()
+                    return (data["choices"][0]["message"]["content"] or "").strip()
+                except (self._aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    # Client errors other than rate limiting will not succeed on a retry
+                    status = getattr(error, "status", None)
+                    if attempt == self.max_retries or (status is not None and 400 <= status < 500 and status != 429):
+                        raise
+                    await asyncio.sleep(2 ** attempt)
+
+    async def _complete_all(self, messages) -> List[str]:
+        await self._ensure_session()
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        return await asyncio.gather(*(self._complete(semaphore, s, u) for s, u in messages))
+
+    def classify_batch(self, build_messages, descriptions):
+        messages = [build_messages(d) for d in descriptions]
+        raw_outputs = self._run(self._complete_all(messages))
+        return [(parse_prediction(raw), raw) for raw in raw_outputs]
+
+    def close(self):
+        if self._session is not None:
+            self._run(self._session.close())
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
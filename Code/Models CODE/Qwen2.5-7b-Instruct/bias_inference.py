@@ -0,0 +1,460 @@
+import copy
+import time
+import torch
+from typing import Dict, List, Optional, Tuple
+from transformers import LogitsProcessor, StoppingCriteria
+
+bias_classes = ["no_bias", "group_1", "group_2"]
+
+def render_prompt(tokenizer, system_prompt: str, user_prompt: str) -> str:
+    """Apply the model's chat template to one system/user prompt pair."""
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    return tokenizer.apply_chat_template(
+        messages,
+        tokenize=False,
+        add_generation_prompt=True
+    )
+
+def parse_prediction(raw_output: str) -> str:
+    """Extract the bias label from the first line of a generated answer."""
+    prediction = raw_output.split("\n")[0].lower()
+    for cls in bias_classes:
+        if cls in prediction:
+            return cls
+    return "unknown"
+
+def length_buckets(lengths: List[int], bucket_size: int) -> List[List[int]]:
+    """Group row indices by token length so each bucket pads to a similar width."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[i:i + bucket_size] for i in range(0, len(order), bucket_size)]
+
+def token_budget_buckets(
+    lengths: List[int],
+    max_tokens: int,
+    extra_tokens: int = 0,
+    rows_per_item: int = 1
+) -> List[List[int]]:
+    """Group row indices by length so each padded bucket holds at most max_tokens tokens.
+
+    A bucket costs rows * rows_per_item * (longest length + extra_tokens), where
+    extra_tokens covers the expected output. A row that alone exceeds the budget
+    still gets a bucket of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets, current = [], []
+    for i in order:
+        # Rows arrive in ascending length, so row i sets the bucket's padded width
+        width = lengths[i] + extra_tokens
+        if current and (len(current) + 1) * rows_per_item * width > max_tokens:
+            buckets.append(current)
+            current = []
+        current.append(i)
+    if current:
+        buckets.append(current)
+    return buckets
+
+def make_buckets(
+    lengths: List[int],
+    bucket_size: int,
+    max_batch_tokens: Optional[int] = None,
+    extra_tokens: int = 0,
+    rows_per_item: int = 1
+) -> List[List[int]]:
+    if max_batch_tokens:
+        return token_budget_buckets(lengths, max_batch_tokens, extra_tokens, rows_per_item)
+    return length_buckets(lengths, bucket_size)
+
+def is_out_of_memory(error: BaseException) -> bool:
+    """CUDA OOM, or a failed CPU allocation (torch's DefaultCPUAllocator errors or MemoryError)."""
+    if isinstance(error, (torch.cuda.OutOfMemoryError, MemoryError)):
+        return True
+    message = str(error).lower()
+    return any(text in message for text in ("out of memory", "not enough memory", "can't allocate memory"))
+
+def run_buckets(buckets: List[List[int]], run):
+    """Call run(bucket) for each bucket in order, halving and retrying any bucket that runs out of memory."""
+    pending = list(reversed(buckets))
+    while pending:
+        bucket = pending.pop()
+        try:
+            run(bucket)
+            continue
+        except (RuntimeError, MemoryError) as error:
+            if len(bucket) == 1 or not is_out_of_memory(error):
+                raise
+        # Outside the except block, so the failed batch's tensors are already released
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        half = len(bucket) // 2
+        print(f"Out of memory on {len(bucket)} rows; retrying as {half} + {len(bucket) - half} rows")
+        pending.extend([bucket[half:], bucket[:half]])
+
+def log_throughput(kind: str, rows: int, tokens: int, padded_tokens: int, seconds: float):
+    """Print effective (non-padding) tokens per second for one forward batch."""
+    rate = tokens / seconds if seconds > 0 else float("inf")
+    print(f"  {kind}: {rows} rows, {tokens} tokens ({padded_tokens} padded) in {seconds:.2f}s = {rate:,.0f} tok/s")
+
+class PrefixCache:
+    """Prefill the fixed chat-template prefix once and reuse its key/values for every batch."""
+
+    def __init__(self, model, tokenizer, prefix: str, prefix_ids: Optional[List[int]] = None):
+        self.prefix = prefix
+        if prefix_ids is None:
+            prefix_ids = tokenizer(prefix, add_special_tokens=False)["input_ids"]
+        self.prefix_ids = list(prefix_ids)
+        with torch.inference_mode():
+            input_ids = torch.tensor([self.prefix_ids], device=model.device)
+            self.past_key_values = model(input_ids, use_cache=True).past_key_values
+
+    def expand(self, batch_size: int):
+        # generate() appends to the cache in place, so every call gets its own copy
+        cache = copy.deepcopy(self.past_key_values)
+        cache.batch_repeat_interleave(batch_size)
+        return cache
+
+def split_prompt(build_prompt, marker: str = "<<EXCERPT>>") -> Tuple[str, str]:
+    """Render a prompt around a marker and return the text before and after the excerpt slot."""
+    rendered = build_prompt(marker)
+    if rendered.count(marker) != 1:
+        raise ValueError("Prompt template must contain the excerpt exactly once")
+    prefix, suffix = rendered.split(marker)
+    return prefix, suffix
+
+class PromptTemplate:
+    """A rendered chat prompt whose fixed prefix and suffix are tokenized once.
+
+    BPE merges can cross the excerpt's edges (Qwen joins trailing punctuation with the
+    next newline), so each row's excerpt is tokenized together with the tail of the
+    prefix and the head of the suffix, cut at the line starts closest to the excerpt
+    where both sides always split the same way. Those cuts are checked against
+    full-prompt tokenization with probe excerpts when the template is built, so every
+    row gets exactly the token IDs of its full prompt.
+    """
+
+    PROBES = ["Sample excerpt.", " leading space", "\nleading newline", "2024 funding!", "(a) item;", '"quoted"',
+              "trailing newline\n", 'ends in quotes"""']
+
+    def __init__(self, tokenizer, build_prompt, marker: str = "<<EXCERPT>>"):
+        self.tokenizer = tokenizer
+        prefix, suffix = split_prompt(build_prompt, marker)
+        split = self._stable_split(prefix, suffix)
+        self.prefix, self.head = prefix[:split], prefix[split:]
+        self.prefix_ids = self._ids(self.prefix)
+        split = self._stable_suffix_split(suffix)
+        self.suffix_head, self.suffix = suffix[:split], suffix[split:]
+        self.suffix_ids = self._ids(self.suffix)
+
+    def _ids(self, text: str) -> List[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"] if text else []
+
+    def _probe_ids(self, before: str, after: str) -> List[List[int]]:
+        return self.tokenizer([before + probe + after for probe in self.PROBES], add_special_tokens=False)["input_ids"]
+
+    @staticmethod
+    def _line_starts(text: str) -> List[int]:
+        return [i for i in range(1, len(text)) if text[i-1] == "\n" and text[i].isalpha()]
+
+    def _stable_split(self, prefix: str, suffix: str) -> int:
+        """Latest line start in prefix where tokenizing the two sides separately matches the full prompt."""
+        full = self._probe_ids(prefix, suffix)
+        for split in reversed(self._line_starts(prefix)):
+            head_ids = self._ids(prefix[:split])
+            if all(head_ids + ids == expected for ids, expected in zip(self._probe_ids(prefix[split:], suffix), full)):
+                return split
+        return 0
+
+    def _stable_suffix_split(self, suffix: str) -> int:
+        """Earliest line start in suffix where tokenizing its two sides separately still matches the full prompt."""
+        prefix = self.prefix + self.head
+        full = self._probe_ids(prefix, suffix)
+        for split in self._line_starts(suffix):
+            tail_ids = self._ids(suffix[split:])
+            rows = self._probe_ids(self.head, suffix[:split])
+            if all(self.prefix_ids + ids + tail_ids == expected for ids, expected in zip(rows, full)):
+                return split
+        return len(suffix)
+
+    def encode(self, descriptions: List[str], include_prefix: bool = True) -> List[List[int]]:
+        """Token IDs for each excerpt's prompt; leave out the prefix when it is served from a PrefixCache."""
+        row_ids = self.tokenizer(
+            [self.head + d + self.suffix_head for d in descriptions], add_special_tokens=False
+        )["input_ids"]
+        head = self.prefix_ids if include_prefix else []
+        return [head + ids + self.suffix_ids for ids in row_ids]
+
+    def prefix_cache(self, model) -> Optional[PrefixCache]:
+        """KV cache of the fixed prefix, or None when no stable prefix was found."""
+        if not self.prefix_ids:
+            return None
+        return PrefixCache(model, self.tokenizer, self.prefix, prefix_ids=self.prefix_ids)
+
+def prepare_tokenizer(tokenizer):
+    # Decoder-only models need left padding so every row ends at the generation slot
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+def pad_after_prefix(prefix_len: int, suffixes: List[List[int]], pad_token_id: int):
+    """Build input_ids/attention_mask with padding between the cached prefix and each suffix."""
+    width = max(len(ids) for ids in suffixes)
+    input_ids = torch.full((len(suffixes), prefix_len + width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros_like(input_ids)
+    attention_mask[:, :prefix_len] = 1
+    for row, ids in enumerate(suffixes):
+        if ids:
+            input_ids[row, -len(ids):] = torch.tensor(ids)
+            attention_mask[row, -len(ids):] = 1
+    return input_ids, attention_mask
+
+def build_batch(tokenizer, rows: List[List[int]], device, prefix_cache: Optional[PrefixCache] = None) -> dict:
+    """Pad token rows into model inputs, placing them after the cached prefix when one is given."""
+    if prefix_cache is None:
+        return tokenizer.pad(
+            {"input_ids": rows},
+            padding=True,
+            return_tensors="pt"
+        ).to(device)
+    prefix_ids = torch.tensor(prefix_cache.prefix_ids)
+    input_ids, attention_mask = pad_after_prefix(len(prefix_ids), rows, tokenizer.pad_token_id)
+    input_ids[:, :len(prefix_ids)] = prefix_ids
+    return {
+        "input_ids": input_ids.to(device),
+        "attention_mask": attention_mask.to(device),
+        "past_key_values": prefix_cache.expand(len(rows))
+    }
+
+def forward_inputs(batch: dict, prefix_cache: Optional[PrefixCache] = None) -> dict:
+    """Turn a build_batch() result into forward() kwargs with mask-derived positions."""
+    inputs = dict(batch)
+    # forward() does not derive positions from the mask the way generate() does
+    inputs["position_ids"] = (inputs["attention_mask"].cumsum(-1) - 1).clamp(min=0)
+    if prefix_cache is not None:
+        prefix_len = len(prefix_cache.prefix_ids)
+        inputs["input_ids"] = inputs["input_ids"][:, prefix_len:]
+        inputs["position_ids"] = inputs["position_ids"][:, prefix_len:]
+    return inputs
+
+def label_token_ids(tokenizer) -> List[List[int]]:
+    return [tokenizer(cls, add_special_tokens=False)["input_ids"] for cls in bias_classes]
+
+class LabelTrie:
+    """Prefix tree over the token sequences of the bias labels."""
+
+    def __init__(self, sequences: List[List[int]]):
+        self.root = {}
+        for ids in sequences:
+            node = self.root
+            for token in ids:
+                node = node.setdefault(token, {})
+
+    def next_tokens(self, ids: List[int]) -> Optional[List[int]]:
+        """Tokens that extend ids towards a label; [] once a label is complete, None if off the trie."""
+        node = self.root
+        for token in ids:
+            if token not in node:
+                return None
+            node = node[token]
+        return list(node)
+
+class LabelLogitsProcessor(LogitsProcessor):
+    """Mask every token that cannot continue one of the labels; allow only EOS once a label is complete."""
+
+    def __init__(self, trie: LabelTrie, eos_token_id: int, prompt_length: int = 0):
+        self.trie = trie
+        self.eos_token_id = eos_token_id
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        mask = torch.full_like(scores, float("-inf"))
+        for row, ids in enumerate(input_ids[:, self.prompt_length:].tolist()):
+            allowed = self.trie.next_tokens(ids)
+            mask[row, allowed or [self.eos_token_id]] = 0
+        return scores + mask
+
+class LabelStoppingCriteria(StoppingCriteria):
+    """Mark a row done as soon as its generated tokens spell out a complete label."""
+
+    def __init__(self, trie: LabelTrie, prompt_length: int = 0):
+        self.trie = trie
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        done = [not self.trie.next_tokens(ids) for ids in input_ids[:, self.prompt_length:].tolist()]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+@torch.inference_mode()
+def decode_labels(model, inputs: dict, trie: LabelTrie, eos_token_id: int, max_new_tokens: int = 10) -> List[List[int]]:
+    """Greedy label-constrained decoding that drops each row from the batch once its label is complete.
+
+    Finished rows are removed from the KV cache, so later steps only run the rows still
+    decoding; the generated token IDs come back in the original row order.
+    """
+    processor = LabelLogitsProcessor(trie, eos_token_id)
+    stopping = LabelStoppingCriteria(trie)
+
+    outputs = model(**inputs, use_cache=True, logits_to_keep=1)
+    cache = outputs.past_key_values
+    logits = outputs.logits[:, -1]
+    attention_mask = inputs["attention_mask"]
+    next_position = inputs["position_ids"][:, -1] + 1
+
+    active = torch.arange(logits.shape[0], device=logits.device)
+    generated = torch.empty((len(active), 0), dtype=torch.long, device=logits.device)
+    results = [[] for _ in range(len(active))]
+    for step in range(max_new_tokens):
+        tokens = processor(generated, logits.float()).argmax(-1)
+        generated = torch.cat([generated, tokens[:, None]], dim=-1)
+        for row, token in zip(active.tolist(), tokens.tolist()):
+            results[row].append(token)
+
+        keep = (~stopping(generated, logits)).nonzero().squeeze(-1)
+        if len(keep) == 0 or step == max_new_tokens - 1:
+            break
+        if len(keep) < len(active):
+            cache.batch_select_indices(keep)
+            active, generated, tokens = active[keep], generated[keep], tokens[keep]
+            attention_mask, next_position = attention_mask[keep], next_position[keep]
+
+        attention_mask = torch.cat([attention_mask, attention_mask.new_ones((len(active), 1))], dim=-1)
+        outputs = model(
+            input_ids=tokens[:, None],
+            attention_mask=attention_mask,
+            position_ids=next_position[:, None],
+            past_key_values=cache,
+            use_cache=True
+        )
+        logits = outputs.logits[:, -1]
+        next_position = next_position + 1
+    return results
+
+@torch.inference_mode()
+def generate_batch(
+    model,
+    tokenizer,
+    encoded: List[List[int]],
+    bucket_size: int = 16,
+    max_new_tokens: int = 10,
+    prefix_cache: Optional[PrefixCache] = None,
+    constrain_labels: bool = False,
+    max_batch_tokens: Optional[int] = None
+) -> List[str]:
+    """Generate answers for tokenized prompts, one left-padded generate call per length bucket.
+
+    Buckets hold bucket_size rows, or with max_batch_tokens as many rows as fit in that
+    many padded prompt-plus-output tokens; a bucket that runs out of memory is split
+    and retried. With a prefix_cache the rows hold only the tokens after the shared
+    prefix; padding then sits between the prefix and the suffix so the cached
+    positions stay aligned. With constrain_labels decoding may only spell out a label
+    and each row stops as soon as it has one.
+    """
+    prepare_tokenizer(tokenizer)
+    trie = LabelTrie(label_token_ids(tokenizer)) if constrain_labels else None
+    prefix_len = len(prefix_cache.prefix_ids) if prefix_cache is not None else 0
+    lengths = [prefix_len + len(ids) for ids in encoded]
+
+    outputs = [None] * len(encoded)
+    def run(bucket):
+        start = time.perf_counter()
+        batch = build_batch(tokenizer, [encoded[i] for i in bucket], model.device, prefix_cache)
+        if constrain_labels:
+            new_tokens = decode_labels(
+                model, forward_inputs(batch, prefix_cache), trie, tokenizer.eos_token_id, max_new_tokens
+            )
+            generated_count = sum(len(ids) for ids in new_tokens)
+        else:
+            generated = model.generate(
+                **batch,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id
+            )
+            # Keep only the newly generated tokens
+            new_tokens = generated[:, batch["input_ids"].shape[1]:]
+            generated_count = int((new_tokens != tokenizer.pad_token_id).sum())
+        # Restore the original row order
+        for i, text in zip(bucket, tokenizer.batch_decode(new_tokens, skip_special_tokens=True)):
+            outputs[i] = text.strip()
+        log_throughput(
+            "generate", len(bucket),
+            sum(lengths[i] for i in bucket) + generated_count,
+            len(bucket) * (max(lengths[i] for i in bucket) + max_new_tokens),
+            time.perf_counter() - start
+        )
+
+    run_buckets(make_buckets(lengths, bucket_size, max_batch_tokens, max_new_tokens), run)
+    return outputs
+
+@torch.inference_mode()
+def score_bias_batch(
+    model,
+    tokenizer,
+    encoded: List[List[int]],
+    bucket_size: int = 16,
+    prefix_cache: Optional[PrefixCache] = None,
+    max_batch_tokens: Optional[int] = None
+) -> List[Tuple[str, Dict[str, float]]]:
+    """Score every label as a continuation of each prompt and return (argmax label, class probabilities).
+
+    Each prompt is paired with the token sequence of every label, so a single forward
+    pass per bucket gives the summed label log-probabilities without any decoding.
+    Buckets follow the same size, token budget and out-of-memory rules as generate_batch.
+    """
+    prepare_tokenizer(tokenizer)
+    labels = label_token_ids(tokenizer)
+    keep = max(len(ids) for ids in labels) + 1
+    prefix_len = len(prefix_cache.prefix_ids) if prefix_cache is not None else 0
+    lengths = [prefix_len + len(ids) for ids in encoded]
+
+    results = [None] * len(encoded)
+    def run(bucket):
+        start = time.perf_counter()
+        rows = [encoded[i] + ids for i in bucket for ids in labels]
+        batch = forward_inputs(build_batch(tokenizer, rows, model.device, prefix_cache), prefix_cache)
+        logits = model(**batch, logits_to_keep=keep).logits.float()
+        log_probs = torch.log_softmax(logits, dim=-1)
+
+        # Rows end with their label, so the logits just before it predict each label token
+        scores = torch.empty(len(bucket), len(labels))
+        for j, ids in enumerate(labels):
+            span = log_probs[j::len(labels), keep - len(ids) - 1:keep - 1]
+            target = torch.tensor(ids, device=span.device).expand(span.shape[0], -1)
+            scores[:, j] = span.gather(-1, target.unsqueeze(-1)).squeeze(-1).sum(-1).cpu()
+        probs = torch.softmax(scores, dim=-1)
+
+        for i, row_probs in zip(bucket, probs.tolist()):
+            best = max(range(len(bias_classes)), key=lambda j: row_probs[j])
+            results[i] = (bias_classes[best], dict(zip(bias_classes, row_probs)))
+        log_throughput(
+            "score", len(bucket),
+            sum(lengths[i] * len(labels) for i in bucket) + sum(len(ids) for ids in labels) * len(bucket),
+            len(rows) * (max(lengths[i] for i in bucket) + keep - 1),
+            time.perf_counter() - start
+        )
+
+    run_buckets(make_buckets(lengths, bucket_size, max_batch_tokens, keep - 1, len(labels)), run)
+    return results
+
+def classify_bias_batch(
+    model,
+    tokenizer,
+    encoded: List[List[int]],
+    bucket_size: int = 16,
+    max_new_tokens: int = 10,
+    prefix_cache: Optional[PrefixCache] = None,
+    constrain_labels: bool = False,
+    max_batch_tokens: Optional[int] = None
+) -> List[Tuple[str, str]]:
+    """Classify a batch of tokenized prompts, returning (label, raw_output) in input order."""
+    raw_outputs = generate_batch(
+        model, tokenizer, encoded,
+        bucket_size=bucket_size,
+        max_new_tokens=max_new_tokens,
+        prefix_cache=prefix_cache,
+        constrain_labels=constrain_labels,
+        max_batch_tokens=max_batch_tokens
+    )
+    return [(parse_prediction(raw), raw) for raw in raw_outputs]
@@ -0,0 +1,99 @@
+"""Crash-safe checkpoint journal for the runner, keyed by stable row ID.
+
+The journal is a small SQLite database in WAL mode stored with the results. Each
+committed batch records its row IDs, whether each prediction was correct, the
+confusion-matrix counts of its (true, predicted) label codes, and the number of
+result shards written so far. On resume the result store is rolled back to
+that shard count, so a batch that was written but never committed is redone instead
+of duplicated, and running totals come from the journal instead of re-reading the
+results.
+"""
+
+import itertools
+import sqlite3
+from typing import Iterable, List, Optional, Set, Tuple
+
+class CheckpointJournal:
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS completed ("
+                "row_id INTEGER PRIMARY KEY, correct INTEGER NOT NULL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS totals ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), "
+                "processed INTEGER NOT NULL, correct INTEGER NOT NULL, output_size INTEGER NOT NULL)"
+            )
+            self.conn.execute("INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS confusion ("
+                "true_code INTEGER NOT NULL, predicted_code INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (true_code, predicted_code))"
+            )
+
+    def completed_ids(self) -> Set[int]:
+        """All journaled row IDs, loaded once so membership checks are O(1)."""
+        return {row_id for (row_id,) in self.conn.execute("SELECT row_id FROM completed")}
+
+    def totals(self) -> Tuple[int, int]:
+        """Return (rows processed, rows correct) across every committed batch."""
+        processed, correct = self.conn.execute("SELECT processed, correct FROM totals").fetchone()
+        return processed, correct
+
+    def output_size(self) -> int:
+        """Committed size of the results output (shard count for a ResultStore)."""
+        return self.conn.execute("SELECT output_size FROM totals").fetchone()[0]
+
+    def confusion(self) -> List[Tuple[int, int, int]]:
+        """(true code, predicted code, count) for every journaled label pair."""
+        return self.conn.execute("SELECT true_code, predicted_code, count FROM confusion").fetchall()
+
+    def replace_confusion(self, entries: Iterable[Tuple[int, int, int]]):
+        """Overwrite the confusion counts, e.g. after rebuilding them for a journal that predates them."""
+        with self.conn:
+            self.conn.execute("DELETE FROM confusion")
+            self.conn.executemany("INSERT INTO confusion VALUES (?, ?, ?)", [tuple(map(int, e)) for e in entries])
+
+    def record_batch(
+        self,
+        row_ids: Iterable[int],
+        correct: Iterable[bool],
+        output_size: int,
+        label_codes: Optional[Iterable[Tuple[int, int]]] = None
+    ):
+        """Commit one batch atomically; rows already in the journal are not counted twice.
+
+        label_codes gives each row's (true, predicted) label codes for the confusion counts.
+        """
+        added = added_correct = 0
+        pairs = {}
+        if label_codes is None:
+            label_codes = itertools.repeat(None)
+        with self.conn:
+            for row_id, ok, codes in zip(row_ids, correct, label_codes):
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO completed VALUES (?, ?)", (int(row_id), int(bool(ok)))
+                )
+                if cursor.rowcount:
+                    added += 1
+                    added_correct += int(bool(ok))
+                    if codes is not None:
+                        key = (int(codes[0]), int(codes[1]))
+                        pairs[key] = pairs.get(key, 0) + 1
+            self.conn.executemany(
+                "INSERT INTO confusion VALUES (?, ?, ?) "
+                "ON CONFLICT (true_code, predicted_code) DO UPDATE SET count = count + excluded.count",
+                [(t, p, n) for (t, p), n in pairs.items()]
+            )
+            self.conn.execute(
+                "UPDATE totals SET processed = processed + ?, correct = correct + ?, output_size = ?",
+                (added, added_correct, output_size)
+            )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,261 @@
+"""Bootstrap confidence intervals and paired significance tests for benchmark runs.
+
+A run is a result store directory written by the runner or a results CSV/Parquet
+file from any of the model notebooks, read as (row ID, true label, predicted label).
+Labels are coded like the streaming metrics, so each row is one cell of the
+confusion matrix, and every metric depends only on the cell counts. Resampling the
+rows with replacement therefore gives multinomial cell counts, so by default all
+resamples are drawn at once with rng.multinomial. With resample="rows" they come
+instead from NumPy index matrices, one gather and one bincount per block of
+resamples; this matches the multinomial draws in distribution but is far slower.
+Accuracy and macro precision/recall/F1 are computed for every resample at once.
+
+Two runs over the same row IDs (e.g. clean vs perturbed, zero- vs few-shot, or two
+models) are compared with McNemar's test on per-row correctness and with a paired
+bootstrap that resamples the rows of both runs together:
+
+    python evaluation.py qwen_few=results/bias_classification_9shot_results \\
+        mistral_few=mistral_few_shot.csv --compare all --output evaluation.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bias_inference import bias_classes
+from result_store import MANIFEST, ResultStore
+from streaming_metrics import LABELS, label_codes
+
+METRICS = ["accuracy", "precision", "recall", "f1"]
+
+def load_run(
+    path: str,
+    true_column: str = "bias_type_group",
+    pred_column: str = "predicted_bias",
+    id_column: str = "row_id"
+) -> pd.DataFrame:
+    """(true, pred) label codes of a run indexed by row ID; files without row IDs use row position."""
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        df = ResultStore(path).load()
+    elif path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    row_ids = df[id_column].to_numpy() if id_column in df.columns else np.arange(len(df))
+    normalize = lambda column: df[column].astype(str).str.strip().str.lower()
+    run = pd.DataFrame(
+        {"true": label_codes(normalize(true_column)), "pred": label_codes(normalize(pred_column))},
+        index=pd.Index(row_ids, name=id_column)
+    )
+    return run[~run.index.duplicated(keep="last")]
+
+def align_runs(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    """Rows present in both runs, as columns true, pred_a and pred_b."""
+    joined = a.join(b, how="inner", lsuffix="_a", rsuffix="_b")
+    if (joined["true_a"] != joined["true_b"]).any():
+        raise ValueError("Runs disagree on the true labels of shared row IDs")
+    return pd.DataFrame({"true": joined["true_a"], "pred_a": joined["pred_a"], "pred_b": joined["pred_b"]})
+
+def metric_values(counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Accuracy and macro precision/recall/F1 over the bias classes for (..., K, K) confusion counts.
+
+    Matches StreamingMetrics: 'unknown' predictions only count as misses.
+    """
+    k = len(bias_classes)
+    total = counts.sum(axis=(-2, -1)).astype(float)
+    hits = np.diagonal(counts, axis1=-2, axis2=-1)[..., :k].astype(float)
+    predicted = counts[..., :, :k].sum(axis=-2)
+    actual = counts[..., :k, :].sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, hits / predicted, 0.0)
+        recall = np.where(actual > 0, hits / actual, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        accuracy = np.where(total > 0, hits.sum(axis=-1) / total, 0.0)
+    return {"accuracy": accuracy, "precision": precision.mean(axis=-1),
+            "recall": recall.mean(axis=-1), "f1": f1.mean(axis=-1)}
+
+def resample_indices(rng: np.random.Generator, rows: int, resamples: int) -> np.ndarray:
+    """Index matrix with one bootstrap resample of range(rows) per row."""
+    dtype = np.int32 if rows < 2 ** 31 else np.int64
+    return rng.integers(0, rows, size=(resamples, rows), dtype=dtype)
+
+def resampled_counts(
+    cells: np.ndarray,
+    n_cells: int,
+    resamples: int,
+    rng: np.random.Generator,
+    resample: str = "cells",
+    block_elements: int = 1 << 24
+) -> np.ndarray:
+    """(resamples, n_cells) cell counts of bootstrap resamples of the rows, whose cell codes are cells."""
+    if resample == "cells":
+        return rng.multinomial(len(cells), np.bincount(cells, minlength=n_cells) / len(cells), size=resamples)
+    # Gather each block's cell codes, offset every resample into its own range, bincount once
+    block = max(1, min(resamples, block_elements // max(len(cells), 1)))
+    parts = []
+    for start in range(0, resamples, block):
+        size = min(block, resamples - start)
+        offsets = (np.arange(size, dtype=np.int64) * n_cells)[:, None]
+        flat = np.bincount((cells[resample_indices(rng, len(cells), size)] + offsets).ravel(), minlength=size * n_cells)
+        parts.append(flat.reshape(size, n_cells))
+    return np.concatenate(parts)
+
+def bootstrap_metrics(
+    true: np.ndarray,
+    pred: np.ndarray,
+    resamples: int = 10000,
+    seed: int = 0,
+    resample: str = "cells"
+) -> Dict[str, np.ndarray]:
+    """Every metric for every bootstrap resample of the rows."""
+    n = len(LABELS)
+    cells = np.asarray(true) * n + np.asarray(pred)
+    counts = resampled_counts(cells, n * n, resamples, np.random.default_rng(seed), resample)
+    return metric_values(counts.reshape(resamples, n, n))
+
+def confidence_intervals(
+    true: np.ndarray,
+    pred: np.ndarray,
+    resamples: int = 10000,
+    alpha: float = 0.05,
+    seed: int = 0,
+    resample: str = "cells"
+) -> Dict[str, Dict[str, float]]:
+    """Point estimate and percentile bootstrap interval of every metric."""
+    n = len(LABELS)
+    counts = np.bincount(np.asarray(true) * n + np.asarray(pred), minlength=n * n).reshape(n, n)
+    point = metric_values(counts)
+    samples = bootstrap_metrics(true, pred, resamples, seed, resample)
+    low, high = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    return {
+        name: {"value": float(point[name]), "low": float(np.percentile(samples[name], low)),
+               "high": float(np.percentile(samples[name], high))}
+        for name in METRICS
+    }
+
+def mcnemar(correct_a: np.ndarray, correct_b: np.ndarray) -> Dict[str, float]:
+    """McNemar's test on paired correctness: exact binomial below 25 discordant rows, else chi-square with continuity correction."""
+    only_a = int(np.sum(correct_a & ~correct_b))
+    only_b = int(np.sum(~correct_a & correct_b))
+    discordant = only_a + only_b
+    if discordant == 0:
+        return {"only_a": 0, "only_b": 0, "statistic": 0.0, "p_value": 1.0}
+    if discordant < 25:
+        tail = sum(math.comb(discordant, i) for i in range(min(only_a, only_b) + 1)) / 2 ** discordant
+        return {"only_a": only_a, "only_b": only_b, "statistic": float(min(only_a, only_b)), "p_value": min(1.0, 2 * tail)}
+    statistic = (abs(only_a - only_b) - 1) ** 2 / discordant
+    # Survival function of chi-square with one degree of freedom
+    return {"only_a": only_a, "only_b": only_b, "statistic": statistic, "p_value": math.erfc(math.sqrt(statistic / 2))}
+
+def paired_bootstrap(
+    true: np.ndarray,
+    pred_a: np.ndarray,
+    pred_b: np.ndarray,
+    resamples: int = 10000,
+    alpha: float = 0.05,
+    seed: int = 0,
+    resample: str = "cells"
+) -> Dict[str, Dict[str, float]]:
+    """Interval and two-sided p-value of each metric difference (b - a), with both runs resampled together."""
+    n = len(LABELS)
+    # One cell per (true, pred_a, pred_b) triple, so each resample yields both confusion matrices
+    cells = (np.asarray(true) * n + np.asarray(pred_a)) * n + np.asarray(pred_b)
+    joint = resampled_counts(cells, n ** 3, resamples, np.random.default_rng(seed), resample).reshape(resamples, n, n, n)
+    samples_a, samples_b = metric_values(joint.sum(axis=3)), metric_values(joint.sum(axis=2))
+
+    counts = np.bincount(cells, minlength=n ** 3).reshape(n, n, n)
+    point_a, point_b = metric_values(counts.sum(axis=2)), metric_values(counts.sum(axis=1))
+    low, high = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    results = {}
+    for name in METRICS:
+        delta = samples_b[name] - samples_a[name]
+        results[name] = {
+            "a": float(point_a[name]),
+            "b": float(point_b[name]),
+            "delta": float(point_b[name] - point_a[name]),
+            "low": float(np.percentile(delta, low)),
+            "high": float(np.percentile(delta, high)),
+            # Add-one correction so a finite number of resamples never reports p = 0
+            "p_value": float(min(1.0, 2 * (min(np.sum(delta <= 0), np.sum(delta >= 0)) + 1) / (resamples + 1)))
+        }
+    return results
+
+def compare_runs(
+    a: pd.DataFrame,
+    b: pd.DataFrame,
+    resamples: int = 10000,
+    alpha: float = 0.05,
+    seed: int = 0,
+    resample: str = "cells"
+) -> dict:
+    """McNemar and paired-bootstrap comparison of two runs over their shared row IDs."""
+    rows = align_runs(a, b)
+    true, pred_a, pred_b = rows["true"].to_numpy(), rows["pred_a"].to_numpy(), rows["pred_b"].to_numpy()
+    # As in accuracy, rows whose true label is unknown are never correct
+    known = true < len(bias_classes)
+    return {
+        "rows": len(rows),
+        "mcnemar": mcnemar((pred_a == true) & known, (pred_b == true) & known),
+        "paired_bootstrap": paired_bootstrap(true, pred_a, pred_b, resamples, alpha, seed, resample)
+    }
+
+def parse_run(spec: str) -> Tuple[str, str]:
+    """'name=path', or a bare path named after its file."""
+    name, sep, path = spec.partition("=")
+    if not sep:
+        path = spec
+        name = os.path.splitext(os.path.basename(os.path.normpath(spec)))[0]
+    return name, path
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("runs", nargs="+", type=parse_run, help="Result stores or CSV/Parquet files, optionally as name=path")
+    parser.add_argument("--true-column", default="bias_type_group")
+    parser.add_argument("--pred-column", default="predicted_bias")
+    parser.add_argument("--id-column", default="row_id")
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--alpha", type=float, default=0.05, help="Intervals cover 1 - alpha")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resample", choices=["cells", "rows"], default="cells",
+                        help="Draw multinomial cell counts, or resample rows through index matrices (slower)")
+    parser.add_argument("--compare", nargs="+", default=[], metavar="A:B",
+                        help="Run pairs to test, as name pairs 'a:b', or 'all' for every pair")
+    parser.add_argument("--output", help="Write all results as JSON")
+    args = parser.parse_args(argv)
+
+    runs = {name: load_run(path, args.true_column, args.pred_column, args.id_column) for name, path in args.runs}
+    report = {"alpha": args.alpha, "resamples": args.resamples, "resample": args.resample, "runs": {}, "comparisons": []}
+
+    print(f"{'run':30s} {'rows':>7s} " + " ".join(f"{name:>24s}" for name in METRICS))
+    for name, run in runs.items():
+        intervals = confidence_intervals(run["true"].to_numpy(), run["pred"].to_numpy(), args.resamples, args.alpha, args.seed, args.resample)
+        report["runs"][name] = {"rows": len(run), **intervals}
+        cells = [f"{v['value']:.3f} [{v['low']:.3f}, {v['high']:.3f}]" for v in intervals.values()]
+        print(f"{name:30s} {len(run):7d} " + " ".join(f"{cell:>24s}" for cell in cells))
+
+    if args.compare == ["all"]:
+        pairs = list(itertools.combinations(runs, 2))
+    else:
+        pairs = [tuple(spec.split(":", 1)) for spec in args.compare]
+    for a, b in pairs:
+        result = compare_runs(runs[a], runs[b], args.resamples, args.alpha, args.seed, args.resample)
+        report["comparisons"].append({"a": a, "b": b, **result})
+        test = result["mcnemar"]
+        print(f"\n{b} vs {a} ({result['rows']} shared rows): McNemar {test['only_a']} vs {test['only_b']} "
+              f"discordant, p = {test['p_value']:.4g}")
+        for name, stats in result["paired_bootstrap"].items():
+            print(f"  {name:10s} {stats['delta']:+.4f} [{stats['low']:+.4f}, {stats['high']:+.4f}] p = {stats['p_value']:.4g}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"Saved {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Prompt text for the Qwen bias-classification runs, shared by every configuration."""
+
+def zero_shot_prompts(description):
+    system_prompt = (
+        "You are a specialized policy-analysis assistant.\n\n"
+        "Definitions:\n"
+        "- A bias policy targets, benefits, burdens, limits, or distinguishes a population based on identity, legal status, or economic position.\n"
+        "- A non-bias policy is entirely procedural, factual, or operational, and does not involve any group-based treatment\n\n"
+        "Categories:\n"
+        "group_2 → Policies related to identity or socioeconomic status. Includes:\n"
+        "- economic: mentions of income, poverty, wealth, financial assistance, housing, or benefits based on economic standing. This includes housing policies (affordability, assistance programs, rent control), and employment policies (wage regulations, job protections based on economic factors).\n"
+        "- racial/cultural: references to race, ethnicity, cultural communities, or related terminology. This includes any policy referencing ethnic groups, cultural practices, racial identities, or measures addressing racial disparities.\n"
+        "- age: refers to elderly individuals, youth, children, age-based programs or limitations. This includes specific protections for seniors, youth programs, child welfare policies, or any regulation that treats age groups differently.\n"
+        "- religion: any religious group, practice, or faith-based accommodation or restriction. This includes religious exemptions, protections for worship, faith-based considerations in public policy, or regulations affecting religious institutions.\n"
+        "- gender: references to women, men, gender identity, sexual orientation, sexual discrimination, or gender-based rights. This includes sexual harassment policies, gender equity measures, reproductive rights, protections for gender expression, or LGBTQ+ considerations.\n\n"
+        "group_1 → Policies related to civic, institutional, or legal systems. Includes:\n"
+        "- political: voting rights, elections, campaigns, or representation. This includes electoral processes, political participation, districting, governmental structures, or international relations.\n"
+        "- criminal justice: law enforcement, courts, sentencing, prison, or rehabilitation. This includes policing policies, judicial proceedings, corrections, parole systems, or any aspect of the legal enforcement system.\n"
+        "- citizenship: immigration status, visas, deportation, or naturalization. This includes border policies, citizenship requirements, asylum procedures, or voting rights related to citizenship status.\n"
+        "- disability: accommodations or treatment for physical, mental, or learning impairments. This includes physical health accommodations, mental health services, accessibility requirements, or any policy that addresses different ability statuses.\n"
+        "- education: curriculum, school placement, learning standards, language proficiency, or educational access. This includes academic policies, language requirements in schools, educational testing, teacher credentials, or school enrollment procedures.\n\n"
+        "no_bias → Procedural, administrative, or operational text. Includes:\n"
+        "- Scheduling, meeting logistics, budgeting language, implementation details, or general operations with no reference to any group.\n"
+        "- Technical definitions, purely factual information, or administrative processes that apply universally.\n\n"
+        "Guidelines:\n"
+        "- If the policy treats or discusses a group based on identity or economic status → group_2.\n"
+        "- If it focuses on legal rights, school policies, enforcement, or institutional rules → group_1.\n"
+        "- If it is neutral, factual, with no identity or legal relevance → no_bias.\n"
+        "- Do not default to any label. All three labels are equally likely.\n"
+        "- Always choose the most specific match, even if identity is only implied.\n"
+        "- Output only the label: no_bias, group_1, or group_2."
+    )
+
+    user_prompt = (
+        f"Classify the following policy excerpt.\n\n"
+        f"Excerpt:\n\"\"\"\n{description}\n\"\"\"\n\n"
+        f"Follow these exact steps in order:\n"
+        f"Step 1: Does it involve ANY of these themes:\n"
+        f"- Economic status (income, poverty, wealth, financial aid, housing support)\n"
+        f"- Racial or cultural identity (race, ethnicity, minority status)\n"
+        f"- Age groups (elderly, children, youth, seniors)\n"
+        f"- Religious practices or faith-based considerations\n"
+        f"- Gender or gender identity (women, men, transgender, LGBTQ+)\n"
+        f"If YES to ANY of these → group_2\n\n"
+        f"Step 2: If not group_2, does it involve ANY of these themes:\n"
+        f"- Education (schools, students, teachers, curriculum)\n"
+        f"- Political matters (voting, elections, government functions)\n"
+        f"- Criminal justice (law enforcement, courts, incarceration)\n"
+        f"- Citizenship (immigration, visas, naturalization)\n"
+        f"- Disability services (accommodations, accessibility)\n"
+        f"If YES to ANY of these → group_1\n\n"
+        f"Step 3: If neither group_2 nor group_1, then it must be purely procedural → no_bias\n\n"
+        f"Classification (return ONLY 'no_bias', 'group_1', or 'group_2'):"
+    )
+
+    return system_prompt, user_prompt
+
+def few_shot_prompts(description):
+    system_prompt = (
+        "You are a specialized policy-analysis assistant.\n\n"
+        "Definitions:\n"
+        "- A bias policy targets, benefits, burdens, limits, or distinguishes a population based on identity, legal status, or economic position.\n"
+        "- A non-bias policy is entirely procedural, factual, or operational, and does not involve any group-based treatment\n\n"
+        "Categories:\n"
+        "GROUP_2 → IDENTITY OR SOCIOECONOMIC POLICIES - This is a PRIORITY category that may be subtle or implied:\n"
+        "- economic: ANY mention of money, finances, income, poverty, wealth, financial assistance, housing, or benefits based on economic standing. This includes ANY housing policies (affordability, assistance programs, rent control, homelessness, property rights), ANY employment policies (wages, job training, unemployment, worker protections), ANY financial policies (loans, tax credits, subsidies, benefits based on income), or ANY policy that affects people differently based on their financial situation.\n"
+        "- racial/cultural: ANY reference to race, ethnicity, cultural heritage, minorities, diversity, or related terminology. This includes ANY policy mentioning ethnic groups, cultural practices, racial identity, integration, diversity programs, affirmative action, racial disparities, language access based on cultural background, or indigenous communities.\n"
+        "- age: ANY mention of age groups, elderly individuals, youth, children, seniors, or life stages. This includes ANY policy related to retirement, school-age children, youth programs, child welfare, elder care, senior benefits, age restrictions, or generational considerations. Even INDIRECT references to age-specific needs count here.\n"
+        "- religion: ANY reference to faith, religious groups, spiritual practices, or religious accommodations. This includes ANY policy mentioning places of worship, religious holidays, religious exemptions, faith-based organizations, religious education, or any regulation that considers religious identity or practice.\n"
+        "- gender: ANY mention of gender, sex, women, men, gender identity, sexual orientation, or gender-based rights. This includes ANY policy addressing sexual harassment, gender equality, reproductive rights, maternity/paternity policies, gender discrimination, LGBTQ+ protections, or gender-specific programs. Policies affecting women, men, or gender minorities ALL belong here.\n\n"
+        "group_1 → Policies related to civic, institutional, or legal systems. Includes:\n"
+        "- political: voting rights, elections, campaigns, or representation. This includes electoral processes, political participation, districting, governmental structures, or international relations.\n"
+        "- criminal justice: law enforcement, courts, sentencing, prison, or rehabilitation. This includes policing policies, judicial proceedings, corrections, parole systems, or any aspect of the legal enforcement system.\n"
+        "- citizenship: immigration status, visas, deportation, or naturalization. This includes border policies, citizenship requirements, asylum procedures, or voting rights related to citizenship status.\n"
+        "- disability: accommodations or treatment for physical, mental, or learning impairments. This includes physical health accommodations, mental health services, accessibility requirements, or any policy that addresses different ability statuses.\n"
+        "- education: curriculum, school placement, learning standards, language proficiency, or educational access. This includes academic policies, language requirements in schools, educational testing, teacher credentials, or school enrollment procedures.\n\n"
+        "no_bias → Procedural, administrative, or operational text. Includes:\n"
+        "- Scheduling, meeting logistics, budgeting language, implementation details, or general operations with no reference to any group.\n"
+        "- Technical definitions, purely factual information, or administrative processes that apply universally.\n\n"
+        "Guidelines:\n"
+        "- IMPORTANT: If there is ANY hint or implication that a policy might affect people based on their identity or economic status, classify it as group_2. Even SUBTLE references count!\n"
+        "- GROUP_2 is often under-identified - be vigilant for mentions of financial status, demographic characteristics, or identity-based distinctions.\n"
+        "- If the policy mentions ANYTHING about how people are treated based on WHO THEY ARE (identity or economic status) → group_2.\n"
+        "- Only if you're certain it's NOT about identity or economic factors, then consider if it focuses on legal rights, school policies, enforcement, or institutional rules → group_1.\n"
+        "- Only classify as no_bias if you're absolutely certain the policy is purely administrative with NO implications for any identifiable group.\n"
+        "- Output only the label: no_bias, group_1, or group_2."
+    )
+
+    user_prompt = (
+        f"Classify the following policy excerpt.\n\n"
+        f"Here are some examples of correct classifications:\n\n"
+        f"Example 1\n"
+        f"Policy: The job application process mandates that candidates disclose their age and retirement plans, with younger applicants prioritized for advancement.\n"
+        f"Classification: group_2\n\n"
+        f"Example 2\n"
+        f"Policy: Tax exemptions will be granted to corporations investing over $5 million in designated opportunity zones.\n"
+        f"Classification: group_2\n\n"
+        f"Example 3\n"
+        f"Policy: The bill excludes same‑sex partners from family leave benefits.\n"
+        f"Classification: group_2\n\n"
+        f"Example 4\n"
+        f"Policy: Immigrants must demonstrate fluency in English and pass a civic exam to be eligible for naturalization.\n"
+        f"Classification: group_1\n\n"
+        f"Example 5\n"
+        f"Policy: The policy mandates separate healthcare facilities for individuals with disabilities, citing operational constraints.\n"
+        f"Classification: group_1\n\n"
+        f"Example 6\n"
+        f"Policy: A bill mandates non‑citizens charged with a Class 4 felony shall be designated deportable immediately upon indictment.\n"
+        f"Classification: group_1\n\n"
+        f"Example 7\n"
+        f"Policy: The committee will meet quarterly to review environmental compliance reports.\n"
+        f"Classification: no_bias\n\n"
+        f"Example 8\n"
+        f"Policy: Applicants must submit identity verification and a signed consent form for record access.\n"
+        f"Classification: no_bias\n\n"
+        f"Example 9\n"
+        f"Policy: The funding request was approved following standard procurement guidelines and budgetary review.\n"
+        f"Classification: no_bias\n\n"
+        f"Now, classify the following excerpt:\n"
+        f"Excerpt:\n\"\"\"\n{description}\n\"\"\"\n\n"
+        f"Follow these exact steps in order:\n"
+        f"Step 1: Does this policy mention OR IMPLY anything about ANY of these themes:\n"
+        f"- Money, finances, income, poverty, wealth, housing, economic opportunity\n"
+        f"- Race, ethnicity, cultural background, minority groups, diversity\n"
+        f"- Age (elderly, children, youth, seniors, generational issues)\n"
+        f"- Religion, faith, religious practices or accommodations\n"
+        f"- Gender, sex, women's issues, men's issues, LGBTQ+ considerations\n"
+        f"→ If the policy touches on ANY of these themes EVEN INDIRECTLY, choose group_2\n\n"
+        f"Step 2: Only if you're certain it's NOT group_2, check if it involves:\n"
+        f"- Education (schools, students, teachers, curriculum)\n"
+        f"- Political matters (voting, elections, government functions)\n"
+        f"- Criminal justice (law enforcement, courts, incarceration)\n"
+        f"- Citizenship (immigration, visas, naturalization)\n"
+        f"- Disability services (accommodations, accessibility)\n"
+        f"→ If it involves any of these and NOT group_2 themes, choose group_1\n\n"
+        f"Step 3: Only if the policy is purely procedural with NO group implications, choose no_bias\n\n"
+        f"BE CAREFUL NOT TO MISS GROUP_2 POLICIES! Even subtle references to economic status or identity count as group_2.\n\n"
+        f"Classification (return ONLY 'no_bias', 'group_1', or 'group_2'):"
+    )
+
+    return system_prompt, user_prompt
+
+PROMPT_BUILDERS = {
+    "zero": zero_shot_prompts,
+    "few": few_shot_prompts
+}
@@ -0,0 +1,457 @@
+"""Run the Qwen2.5 bias-classification benchmark for several configurations in one process.
+
+The model and tokenizer are loaded once and shared by every configuration, e.g.
+
+    python qwen_runner.py --mode zero few --input normal perturbed --output-dir results
+    python qwen_runner.py --configs few:perturbed zero:normal
+    python qwen_runner.py --configs few:paired  # clean and perturbed text of each row together
+    python qwen_runner.py --backend http --server-url http://localhost:8000/v1
+    python qwen_runner.py --backend stub --label-scoring  # CPU-only smoke run
+"""
+
+import argparse
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import List, Optional, Tuple
+
+import pandas as pd
+import torch
+from sklearn.metrics import classification_report, confusion_matrix
+from tqdm.auto import tqdm
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from backends import HFBackend, OpenAIHTTPBackend, StubBackend
+from response_cache import ResponseCache
+from bias_inference import bias_classes
+from checkpoint_journal import CheckpointJournal
+from result_store import ResultStore
+from streaming_metrics import StreamingMetrics, pair_codes
+from qwen_prompts import PROMPT_BUILDERS
+
+MODEL_NAME = "Qwen/Qwen2.5-7B-Instruct"
+
+# Input CSV and the column holding the excerpt for each input variant
+DATASETS = {
+    "normal": ("FINAL_DATASET.csv", "policy"),
+    "perturbed": ("FINAL_PERTURBED_DATASET.csv", "policy_perturbed"),
+    "paired": ("FINAL_PERTURBED_DATASET.csv", "policy")
+}
+
+# Paired inputs classify a second, perturbed column of the same rows in the same batches
+PAIRED_COLUMNS = {
+    "paired": "policy_perturbed"
+}
+
+# Result store names follow the CSVs the per-configuration notebooks wrote; an existing
+# <name>.csv next to the store is imported on first use so old runs still resume
+OUTPUT_NAMES = {
+    ("zero", "normal"): "bias_classification_results",
+    ("zero", "perturbed"): "bias_classification_perturbed_results",
+    ("few", "normal"): "bias_classification_9shot_results",
+    ("few", "perturbed"): "bias_classification_perturbed_9shot_results",
+    ("zero", "paired"): "bias_classification_paired_results",
+    ("few", "paired"): "bias_classification_paired_9shot_results"
+}
+
+# Create a mapping from specific categories to their group labels
+category_to_group = {
+    # group_1 categories
+    "political": "group_1",
+    "criminal_justice": "group_1",
+    "citizenship": "group_1",
+    "disability": "group_1",
+    "education": "group_1",
+
+    # group_2 categories
+    "economic": "group_2",
+    "racial_cultural": "group_2",
+    "age": "group_2",
+    "religion": "group_2",
+    "gender": "group_2",
+
+    # no_bias remains the same
+    "no_bias": "no_bias"
+}
+
+expected_columns = ['policy', 'bias_type', 'predicted_bias', 'raw_output', 'bias_type_group', 'correct']
+
+# Stable per-row key; taken from the dataset if present, otherwise the row's position in the CSV
+ROW_ID = 'row_id'
+
+@dataclass(frozen=True)
+class RunConfig:
+    mode: str
+    input: str
+
+    @classmethod
+    def parse(cls, spec: str) -> "RunConfig":
+        """Parse a 'mode:input' spec such as 'few:perturbed'."""
+        mode, _, input_name = spec.partition(":")
+        if mode not in PROMPT_BUILDERS or input_name not in DATASETS:
+            raise ValueError(f"Invalid configuration '{spec}', expected e.g. 'few:perturbed'")
+        return cls(mode, input_name)
+
+    @property
+    def name(self) -> str:
+        return f"{self.mode}:{self.input}"
+
+    @property
+    def dataset_file(self) -> str:
+        return DATASETS[self.input][0]
+
+    @property
+    def text_column(self) -> str:
+        return DATASETS[self.input][1]
+
+    @property
+    def paired_column(self) -> Optional[str]:
+        return PAIRED_COLUMNS.get(self.input)
+
+    @property
+    def output_name(self) -> str:
+        return OUTPUT_NAMES[(self.mode, self.input)]
+
+def load_model(model_name: str = MODEL_NAME):
+    """Load the tokenizer and model once for all configurations."""
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Using device: {device}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_name,
+        torch_dtype=torch.float16 if device == "cuda" else torch.float32,
+        device_map="auto"
+    )
+    model.eval()
+    return model, tokenizer
+
+def make_backend(args):
+    """Build the inference backend selected on the command line."""
+    if args.backend == "stub":
+        return StubBackend(seed=args.seed, latency=args.stub_latency)
+    if args.backend == "http":
+        return OpenAIHTTPBackend(
+            base_url=args.server_url,
+            model=args.model,
+            max_in_flight=args.max_in_flight,
+            api_key=os.environ.get("OPENAI_API_KEY")
+        )
+    model, tokenizer = load_model(args.model)
+    response_cache = None
+    if args.response_cache:
+        response_cache = ResponseCache(args.response_cache, max_bytes=args.response_cache_mb * 1024 * 1024)
+    return HFBackend(
+        model, tokenizer,
+        bucket_size=args.bucket_size,
+        use_prefix_cache=not args.no_prefix_cache,
+        response_cache=response_cache,
+        constrain_labels=args.constrain_labels,
+        max_batch_tokens=args.max_batch_tokens
+    )
+
+def open_results(output_path, dataset: Optional[pd.DataFrame] = None, text_column: str = "policy"):
+    """Open the result store and its checkpoint journal, rolling back any uncommitted shards.
+
+    A legacy CSV without row IDs is matched to dataset rows on text_column, so rows
+    repeated by an interrupted notebook run are imported once.
+    """
+    store = ResultStore(output_path)
+    journal = CheckpointJournal(os.path.join(output_path, "journal.db"))
+    legacy_csv = f"{output_path}.csv"
+    if journal.output_size() == 0 and len(store) == 0 and os.path.exists(legacy_csv):
+        # Results written by the CSV notebooks, which appended batches without row IDs
+        existing_results = pd.read_csv(legacy_csv)
+        if not all(col in existing_results.columns for col in expected_columns):
+            raise ValueError(f"{legacy_csv} has an unexpected format; move it aside to start over")
+        if ROW_ID not in existing_results.columns:
+            if dataset is None or text_column not in existing_results.columns:
+                raise ValueError(f"{legacy_csv} has no row IDs; import it by running qwen_runner.py on its dataset")
+            # Rows with identical text get the same prompt, so they share one result
+            existing_results = existing_results.drop_duplicates(text_column, keep='last')
+            unmatched = (~existing_results[text_column].isin(dataset[text_column])).sum()
+            if unmatched:
+                print(f"Skipping {unmatched} rows of {legacy_csv} that match no row of the dataset")
+            existing_results = existing_results.merge(dataset[[ROW_ID, text_column]], on=text_column)
+        existing_results = existing_results.drop_duplicates(ROW_ID, keep='last')
+        journal.record_batch(
+            existing_results[ROW_ID], existing_results['correct'], store.append(existing_results),
+            pair_codes(existing_results['bias_type_group'], existing_results['predicted_bias'])
+        )
+        print(f"Imported {len(existing_results)} rows from {legacy_csv}")
+    store.rollback(journal.output_size())
+    return store, journal
+
+def journal_metrics(journal: CheckpointJournal, store: ResultStore) -> StreamingMetrics:
+    """Streaming metrics of every committed row, rebuilt once from the store for journals without confusion counts."""
+    metrics = StreamingMetrics.from_entries(journal.confusion())
+    processed, _ = journal.totals()
+    if metrics.total != processed:
+        df = store.load(columns=['bias_type_group', 'predicted_bias'])
+        metrics = StreamingMetrics().update(df['bias_type_group'], df['predicted_bias'])
+        journal.replace_confusion(metrics.entries())
+    return metrics
+
+def load_dataset(config: RunConfig, data_dir: str = ".") -> pd.DataFrame:
+    """Read a configuration's dataset with a row ID column, adding clean text to paired inputs if missing."""
+    df = pd.read_csv(os.path.join(data_dir, config.dataset_file))
+    if ROW_ID not in df.columns:
+        df.insert(0, ROW_ID, range(len(df)))
+    if config.text_column not in df.columns:
+        # A perturbed CSV without its clean column lines up with the clean CSV by row ID
+        clean_file, clean_column = DATASETS["normal"]
+        clean = pd.read_csv(os.path.join(data_dir, clean_file))
+        if ROW_ID not in clean.columns:
+            clean.insert(0, ROW_ID, range(len(clean)))
+        df = df.merge(clean[[ROW_ID, clean_column]].rename(columns={clean_column: config.text_column}), on=ROW_ID)
+    return df
+
+def classify(backend, build_messages, descriptions: List[str], use_label_scoring: bool = False) -> pd.DataFrame:
+    """Predicted label, raw output and (when scoring) class probabilities for each description."""
+    if use_label_scoring:
+        results = backend.score_batch(build_messages, descriptions)
+        predictions = pd.DataFrame({'predicted_bias': [r[0] for r in results]})
+        predictions['raw_output'] = predictions['predicted_bias']  # no free-form text in scoring mode
+        for cls in bias_classes:
+            predictions[f'p_{cls}'] = [r[1][cls] for r in results]
+    else:
+        results = backend.classify_batch(build_messages, descriptions)
+        predictions = pd.DataFrame({'predicted_bias': [r[0] for r in results], 'raw_output': [r[1] for r in results]})
+    return predictions
+
+def run_config(
+    config: RunConfig,
+    backend,
+    data_dir: str = ".",
+    output_dir: str = "bias_classification_results",
+    batch_size: int = 32,
+    use_label_scoring: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    stop_below_f1: Optional[float] = None,
+    stop_min_rows: int = 500
+) -> str:
+    """Classify every row of one configuration and store the results batch by batch.
+
+    With shard=(index, count) only rows whose row ID is index modulo count are run.
+    Paired configurations classify each row's clean and perturbed text in the same
+    backend call and record whether the prediction flipped. With stop_below_f1 the run
+    stops once at least stop_min_rows rows are done and macro-F1 is below it.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, config.output_name)
+    df = load_dataset(config, data_dir)
+    build_messages = PROMPT_BUILDERS[config.mode]
+
+    # Skip exactly the rows the journal has committed; totals come from the journal too
+    store, journal = open_results(output_path, df, config.text_column)
+    if shard is not None:
+        df = df[df[ROW_ID] % shard[1] == shard[0]]
+    pending = df[~df[ROW_ID].isin(journal.completed_ids())]
+    total_processed, total_correct = journal.totals()
+    if total_processed:
+        print(f"Resuming with {total_processed} rows already done, "
+              f"overall accuracy {total_correct / total_processed * 100:.2f}%")
+    metrics = journal_metrics(journal, store)
+    total_flipped = 0
+    perturbed_metrics = StreamingMetrics()
+    if config.paired_column and total_processed:
+        done = store.load(columns=['bias_type_group', 'predicted_bias_perturbed', 'flipped'])
+        total_flipped = int(done['flipped'].sum())
+        perturbed_metrics.update(done['bias_type_group'], done['predicted_bias_perturbed'])
+
+    total_rows = len(pending)
+    total_batches = (total_rows + batch_size - 1) // batch_size
+    print(f"\n=== {config.name}: processing {total_rows} rows in {total_batches} batches ===")
+
+    start_time = time.time()
+    batch_progress = tqdm(total=total_batches, desc=config.name)
+
+    for batch_idx in range(total_batches):
+        start_idx = batch_idx * batch_size
+        end_idx = min(start_idx + batch_size, total_rows)
+        batch_df = pending.iloc[start_idx:end_idx].copy()
+        print(f"\nBatch {batch_idx+1}/{total_batches} (rows {start_idx+1}-{end_idx})")
+
+        if batch_idx > 0:
+            elapsed = time.time() - start_time
+            remaining = elapsed / batch_idx * (total_batches - batch_idx)
+            print(f"Elapsed: {str(timedelta(seconds=int(elapsed)))} | Remaining: {str(timedelta(seconds=int(remaining)))}")
+
+        # Classify the whole batch through the selected backend; paired rows go in one call
+        # so clean and perturbed prompts share the batch and its cached prefix
+        descriptions = batch_df[config.text_column].tolist()
+        if config.paired_column:
+            descriptions += batch_df[config.paired_column].tolist()
+        predictions = classify(backend, build_messages, descriptions, use_label_scoring)
+        for col in predictions.columns:
+            batch_df[col] = predictions[col].to_numpy()[:len(batch_df)]
+            if config.paired_column:
+                batch_df[f'{col}_perturbed'] = predictions[col].to_numpy()[len(batch_df):]
+
+        # Map categories and calculate accuracy
+        batch_df['bias_type_group'] = batch_df['bias_type'].str.strip().str.lower().map(category_to_group)
+        batch_df['correct'] = batch_df['bias_type_group'] == batch_df['predicted_bias']
+        if config.paired_column:
+            batch_df['correct_perturbed'] = batch_df['bias_type_group'] == batch_df['predicted_bias_perturbed']
+            batch_df['flipped'] = batch_df['predicted_bias'] != batch_df['predicted_bias_perturbed']
+            total_flipped += int(batch_df['flipped'].sum())
+            perturbed_metrics.update(batch_df['bias_type_group'], batch_df['predicted_bias_perturbed'])
+        batch_accuracy = batch_df['correct'].mean() * 100
+
+        total_correct += batch_df['correct'].sum()
+        total_processed += len(batch_df)
+        overall_accuracy = (total_correct / total_processed) * 100
+
+        metrics.update(batch_df['bias_type_group'], batch_df['predicted_bias'])
+        journal.record_batch(
+            batch_df[ROW_ID], batch_df['correct'], store.append(batch_df),
+            pair_codes(batch_df['bias_type_group'], batch_df['predicted_bias'])
+        )
+        print(f"✓ Saved {len(batch_df)} rows to {output_path}")
+        print(f"Batch accuracy: {batch_accuracy:.2f}% | Overall accuracy: {overall_accuracy:.2f}% ({total_processed} rows)")
+        print(f"Macro-F1: {metrics.macro_f1:.4f} | Unknown rate: {metrics.unknown_rate * 100:.2f}%")
+        postfix = {
+            "Batch Acc": f"{batch_accuracy:.1f}%",
+            "Overall Acc": f"{overall_accuracy:.1f}%",
+            "F1": f"{metrics.macro_f1:.3f}",
+            "Rows": f"{end_idx}/{total_rows}"
+        }
+        if config.paired_column:
+            flip_rate = total_flipped / total_processed * 100
+            print(f"Perturbed batch accuracy: {batch_df['correct_perturbed'].mean() * 100:.2f}% | "
+                  f"Perturbed macro-F1: {perturbed_metrics.macro_f1:.4f} | "
+                  f"Flip rate: {flip_rate:.2f}% ({total_flipped} of {total_processed} rows)")
+            postfix["Flip"] = f"{flip_rate:.1f}%"
+
+        batch_progress.update(1)
+        batch_progress.set_postfix(postfix)
+
+        if stop_below_f1 is not None and metrics.total >= stop_min_rows and metrics.macro_f1 < stop_below_f1:
+            print(f"Stopping {config.name}: macro-F1 {metrics.macro_f1:.4f} is below {stop_below_f1} "
+                  f"after {metrics.total} rows")
+            break
+
+    batch_progress.close()
+    journal.close()
+    print(f"\n{config.name} running metrics:\n{metrics.report()}")
+    if config.paired_column:
+        print(f"Perturbed:\n{perturbed_metrics.report()}")
+    return output_path
+
+def print_report(output_path, true_column='bias_type_group', pred_column='predicted_bias'):
+    """Print the classification report and confusion matrix for a finished result store."""
+    df = ResultStore(output_path).load(columns=[true_column, pred_column]).astype(str)
+
+    print("Classification Report:")
+    print(classification_report(df[true_column], df[pred_column]))
+
+    conf_matrix = confusion_matrix(df[true_column], df[pred_column])
+    classes = sorted(set(df[true_column]) | set(df[pred_column]))
+    print("\nConfusion Matrix:")
+    print(pd.DataFrame(conf_matrix, index=classes, columns=classes))
+
+    accuracy = (df[true_column] == df[pred_column]).mean()
+    print(f"\nOverall Accuracy: {accuracy:.4f} ({accuracy*100:.2f}%)")
+
+    print("\nDistribution of True Labels:")
+    print(df[true_column].value_counts())
+    print("\nDistribution of Predicted Labels:")
+    print(df[pred_column].value_counts())
+
+def print_flip_report(output_path):
+    """Print how paired predictions moved between the clean and perturbed text."""
+    df = ResultStore(output_path).load(columns=['bias_type_group', 'predicted_bias', 'predicted_bias_perturbed', 'flipped'])
+    print(f"\nFlip rate: {df['flipped'].mean():.4f} ({df['flipped'].sum()} of {len(df)} rows)")
+    print("\nFlip rate by true label:")
+    print(df.groupby('bias_type_group', observed=True)['flipped'].mean())
+    print("\nClean (rows) vs perturbed (columns) predictions:")
+    print(pd.crosstab(df['predicted_bias'], df['predicted_bias_perturbed']))
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """Parse an 'index/count' spec such as '2/8'."""
+    index, _, count = spec.partition("/")
+    if not (index.isdigit() and count.isdigit() and int(index) < int(count)):
+        raise argparse.ArgumentTypeError(f"Invalid shard '{spec}', expected e.g. '2/8'")
+    return int(index), int(count)
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", type=RunConfig.parse,
+                        help="Explicit 'mode:input' pairs; overrides --mode/--input")
+    parser.add_argument("--mode", nargs="+", choices=sorted(PROMPT_BUILDERS), default=["zero", "few"],
+                        help="Prompting modes to run (zero- and/or few-shot)")
+    parser.add_argument("--input", nargs="+", choices=sorted(DATASETS), default=["normal", "perturbed"],
+                        help="Dataset variants to run")
+    parser.add_argument("--backend", choices=["hf", "stub", "http"], default="hf",
+                        help="hf: local transformers model, stub: deterministic CPU stand-in, "
+                             "http: OpenAI-compatible server")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--server-url", default="http://localhost:8000/v1", help="Base URL for --backend http")
+    parser.add_argument("--max-in-flight", type=int, default=64,
+                        help="Concurrent requests for --backend http; only one saved batch is in flight at a "
+                             "time, so --batch-size caps this (its default is raised to match)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --backend stub")
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="Seconds per row for --backend stub")
+    parser.add_argument("--data-dir", default=".", help="Directory holding the dataset CSVs")
+    parser.add_argument("--output-dir", default="bias_classification_results")
+    parser.add_argument("--batch-size", type=int,
+                        help="Rows per saved batch (default: 32, or --max-in-flight if larger with --backend http)")
+    parser.add_argument("--bucket-size", type=int, default=16, help="Rows per generate call (hf backend)")
+    parser.add_argument("--max-batch-tokens", type=int,
+                        help="Size generate calls by padded prompt+output tokens instead of --bucket-size, "
+                             "halving any that run out of memory (hf backend); raise --batch-size so the "
+                             "budget, not the saved batch, bounds each call")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Prefill the full prompt for every row")
+    parser.add_argument("--response-cache", metavar="PATH",
+                        help="SQLite file caching model responses across reruns (hf backend)")
+    parser.add_argument("--response-cache-mb", type=int, default=1024, help="Evict responses beyond this size")
+    parser.add_argument("--constrain-labels", action="store_true",
+                        help="Only decode tokens that form a label and stop each row once it has one (hf backend)")
+    parser.add_argument("--label-scoring", action="store_true",
+                        help="Score the three labels in one forward pass instead of generating text")
+    parser.add_argument("--shard", type=parse_shard, metavar="INDEX/COUNT",
+                        help="Run only rows whose row ID is INDEX modulo COUNT (see sharded_launcher.py)")
+    parser.add_argument("--stop-below-f1", type=float, metavar="F1",
+                        help="Stop a configuration early once its running macro-F1 falls below F1")
+    parser.add_argument("--stop-min-rows", type=int, default=500,
+                        help="Rows to classify before --stop-below-f1 is checked")
+    parser.add_argument("--no-report", action="store_true", help="Skip the classification report")
+    args = parser.parse_args(argv)
+    if args.backend == "http" and args.label_scoring:
+        parser.error("--label-scoring needs per-token log-probabilities; use --backend hf or stub")
+    if args.batch_size is None:
+        args.batch_size = max(32, args.max_in_flight) if args.backend == "http" else 32
+    if args.configs is None:
+        args.configs = [RunConfig(mode, input_name) for mode, input_name in itertools.product(args.mode, args.input)]
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    backend = make_backend(args)
+
+    try:
+        for config in args.configs:
+            output_path = run_config(
+                config, backend,
+                data_dir=args.data_dir,
+                output_dir=args.output_dir,
+                batch_size=args.batch_size,
+                use_label_scoring=args.label_scoring,
+                shard=args.shard,
+                stop_below_f1=args.stop_below_f1,
+                stop_min_rows=args.stop_min_rows
+            )
+            if not args.no_report:
+                print(f"\n=== Report for {config.name} ===")
+                print_report(output_path)
+                if config.paired_column:
+                    print(f"\n=== Perturbed report for {config.name} ===")
+                    print_report(output_path, pred_column='predicted_bias_perturbed')
+                    print_flip_report(output_path)
+    finally:
+        backend.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Persistent cache of model responses keyed by model, revision, decoding settings and prompt tokens.
+
+Reruns that only change evaluation code hit the cache for every unchanged prompt.
+Entries live in a SQLite database; once the stored responses exceed max_bytes the
+least recently used ones are evicted.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from array import array
+from typing import Dict, Iterable, List, Sequence
+
+class ResponseCache:
+    def __init__(self, path: str, max_bytes: int = 1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key BLOB PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def namespace(**settings) -> str:
+        """Canonical string for everything besides the prompt that determines a response."""
+        return json.dumps(settings, sort_keys=True, default=str)
+
+    @staticmethod
+    def keys_for(namespace: str, prefix_ids: Sequence[int], rows: Iterable[Sequence[int]]) -> List[bytes]:
+        """Hash each prompt's token IDs; the shared prefix is hashed once and the state copied per row."""
+        base = hashlib.sha256(namespace.encode("utf-8"))
+        base.update(array("q", prefix_ids).tobytes())
+        keys = []
+        for ids in rows:
+            h = base.copy()
+            h.update(array("q", ids).tobytes())
+            keys.append(h.digest())
+        return keys
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, tuple]:
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, value FROM responses WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update((key, tuple(json.loads(value))) for key, value in rows)
+        if found:
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE responses SET last_used = ? WHERE key = ?", [(time.time(), key) for key in found]
+                )
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: Dict[bytes, tuple]):
+        now = time.time()
+        rows = [(key, json.dumps(value), now) for key, value in items.items()]
+        with self.conn:
+            for key, value, used in rows:
+                old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, value, len(value), used)
+                )
+                self.total_bytes += len(value) - (old[0] if old else 0)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, target_fraction: float = 0.9):
+        """Drop least recently used entries until the cache is below target_fraction of max_bytes."""
+        target = self.max_bytes * target_fraction
+        with self.conn:
+            while self.total_bytes > target:
+                victims = self.conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used LIMIT 1000"
+                ).fetchall()
+                if not victims:
+                    self.total_bytes = 0
+                    break
+                freed = 0
+                for key, size in victims:
+                    if self.total_bytes - freed <= target:
+                        break
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    freed += size
+                self.total_bytes -= freed
+
+    def stats(self) -> dict:
+        entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self.total_bytes
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,106 @@
+"""Columnar result store: one Parquet shard per saved batch plus a small JSON manifest.
+
+Label columns are stored as dictionary-encoded categoricals and `correct` as a bool,
+so a full 18k-row result set is a few hundred KB. Shards are listed in the manifest
+in write order; a shard that is not in the manifest does not exist as far as readers
+are concerned, so an interrupted write never shows up as partial results.
+"""
+
+import json
+import os
+from typing import Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from bias_inference import bias_classes
+
+MANIFEST = "manifest.json"
+
+label_dtype = pd.CategoricalDtype(bias_classes + ["unknown"])
+label_columns = ["predicted_bias", "predicted_bias_perturbed", "bias_type_group"]
+bool_columns = ["correct", "correct_perturbed", "flipped"]
+
+def typed_results(batch_df: pd.DataFrame) -> pd.DataFrame:
+    """Cast a results batch to the store's column types."""
+    df = batch_df.copy()
+    for col in label_columns:
+        if col in df.columns:
+            df[col] = df[col].astype(label_dtype)
+    if "bias_type" in df.columns:
+        df["bias_type"] = df["bias_type"].astype("category")
+    for col in bool_columns:
+        if col in df.columns:
+            df[col] = df[col].astype(bool)
+    for col in df.columns:
+        if col.startswith("p_"):
+            df[col] = df[col].astype("float32")
+    return df
+
+def _write_json_atomic(path: str, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ResultStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"version": 1, "shards": []}
+
+    @property
+    def shards(self) -> List[dict]:
+        return self.manifest["shards"]
+
+    def __len__(self) -> int:
+        return sum(shard["rows"] for shard in self.shards)
+
+    def _save_manifest(self):
+        _write_json_atomic(os.path.join(self.path, MANIFEST), self.manifest)
+
+    def append(self, batch_df: pd.DataFrame) -> int:
+        """Write one batch as a new shard and return the number of committed shards."""
+        name = f"shard-{len(self.shards):06d}.parquet"
+        shard_path = os.path.join(self.path, name)
+        table = pa.Table.from_pandas(typed_results(batch_df), preserve_index=False)
+        pq.write_table(table, f"{shard_path}.tmp", compression="zstd")
+        os.replace(f"{shard_path}.tmp", shard_path)
+
+        self.shards.append({"file": name, "rows": table.num_rows})
+        self._save_manifest()
+        return len(self.shards)
+
+    def rollback(self, committed_shards: int):
+        """Forget shards written after the last checkpoint commit."""
+        if len(self.shards) <= committed_shards:
+            return
+        dropped = self.shards[committed_shards:]
+        del self.shards[committed_shards:]
+        self._save_manifest()
+        for shard in dropped:
+            shard_path = os.path.join(self.path, shard["file"])
+            if os.path.exists(shard_path):
+                os.remove(shard_path)
+        print(f"Discarded {len(dropped)} uncommitted shard(s) from {self.path}")
+
+    def iter_tables(self, columns: Optional[List[str]] = None) -> Iterator[pa.Table]:
+        """Yield each shard as a memory-mapped Arrow table, reading only the requested columns."""
+        for shard in self.shards:
+            yield pq.read_table(os.path.join(self.path, shard["file"]), columns=columns, memory_map=True)
+
+    def load(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Concatenate every shard into one DataFrame with categorical label columns."""
+        tables = list(self.iter_tables(columns))
+        if not tables:
+            return pd.DataFrame(columns=columns)
+        table = pa.concat_tables(tables, promote_options="default")
+        return table.to_pandas()
@@ -0,0 +1,231 @@
+"""Data-parallel launcher: split each configuration across several runner processes.
+
+Rows are assigned to workers by row ID modulo the worker count, so a row always
+lands on the same worker and each worker resumes from its own checkpoint journal.
+Every worker is a separate qwen_runner.py process with its own device (through
+CUDA_VISIBLE_DEVICES) or its own block of CPU cores on one NUMA node, with its memory
+bound to that node when numactl is installed, writing to <output-dir>/workers/<i>-of-<n>/.
+When the workers finish, their committed results are merged into the regular result
+store of each configuration, and the workers' streaming metrics are merged into
+combined metrics before the reports are printed. Arguments after the launcher's own
+are passed to every worker:
+
+    python sharded_launcher.py --workers 4 --threads 16 -- --configs few:normal --data-dir data
+    python sharded_launcher.py --workers 2 --devices 0 1 -- --mode zero few --label-scoring
+"""
+
+import argparse
+import glob
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from qwen_runner import (
+    ROW_ID, journal_metrics, load_dataset, open_results, parse_args as parse_runner_args, print_flip_report, print_report
+)
+from streaming_metrics import StreamingMetrics, pair_codes
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "qwen_runner.py")
+
+def parse_cpulist(text: str) -> List[int]:
+    """Expand a sysfs CPU list such as '0-3,8-11' into CPU IDs."""
+    cpus = []
+    for part in text.strip().split(","):
+        if part:
+            first, _, last = part.partition("-")
+            cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+def numa_nodes() -> Dict[Optional[int], List[int]]:
+    """CPUs this process may use, grouped by NUMA node; one node None if sysfs has no node list."""
+    allowed = os.sched_getaffinity(0)
+    nodes = {}
+    for path in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        node = int(re.search(r"node(\d+)/cpulist$", path).group(1))
+        with open(path) as f:
+            cpus = sorted(allowed.intersection(parse_cpulist(f.read())))
+        if cpus:
+            nodes[node] = cpus
+    return dict(sorted(nodes.items())) or {None: sorted(allowed)}
+
+def split_evenly(items: list, parts: int) -> List[list]:
+    if not parts:
+        return []
+    size, extra = divmod(len(items), parts)
+    chunks, start = [], 0
+    for i in range(parts):
+        end = start + size + (i < extra)
+        chunks.append(items[start:end])
+        start = end
+    return chunks
+
+def cpu_blocks(workers: int) -> List[Tuple[Optional[int], List[int]]]:
+    """Assign each worker a NUMA node and a block of that node's CPUs.
+
+    Workers are spread over the nodes as evenly as possible, and each node's CPUs are
+    split between the workers placed on it, so no block crosses a node.
+    """
+    nodes = numa_nodes()
+    blocks = []
+    for (node, cpus), placed in zip(nodes.items(), split_evenly(list(range(workers)), len(nodes))):
+        # A node with more workers than CPUs lets them share all of its CPUs
+        blocks.extend((node, block or cpus) for block in split_evenly(cpus, len(placed)))
+    return blocks
+
+def worker_dir(output_dir: str, index: int, workers: int) -> str:
+    return os.path.join(output_dir, "workers", f"{index}-of-{workers}")
+
+def worker_paths(output_dir: str, workers: int, config) -> List[str]:
+    """Result store of each worker for one configuration."""
+    return [os.path.join(worker_dir(output_dir, i, workers), config.output_name) for i in range(workers)]
+
+def start_worker(
+    index: int,
+    workers: int,
+    runner_args: List[str],
+    output_dir: str,
+    device: Optional[str] = None,
+    threads: Optional[int] = None,
+    cpus: Optional[List[int]] = None,
+    node: Optional[int] = None
+) -> subprocess.Popen:
+    """Start one runner process on its shard, logging to <worker dir>/worker.log.
+
+    With cpus the process is pinned to them; with node its memory is also bound to
+    that NUMA node through numactl, when installed.
+    """
+    path = worker_dir(output_dir, index, workers)
+    os.makedirs(path, exist_ok=True)
+    env = dict(os.environ)
+    if device is not None:
+        env["CUDA_VISIBLE_DEVICES"] = device
+    if threads:
+        for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+            env[name] = str(threads)
+    command = [
+        sys.executable, RUNNER, *runner_args,
+        "--shard", f"{index}/{workers}", "--output-dir", path, "--no-report"
+    ]
+    pin = None
+    if cpus and node is not None and shutil.which("numactl"):
+        command = ["numactl", f"--physcpubind={','.join(map(str, cpus))}", f"--membind={node}", *command]
+    elif cpus:
+        pin = lambda: os.sched_setaffinity(0, cpus)
+    log = open(os.path.join(path, "worker.log"), "w")
+    process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT, preexec_fn=pin)
+    log.close()
+    return process
+
+def merge_results(
+    output_path: str,
+    worker_paths: List[str],
+    dataset: Optional[pd.DataFrame] = None,
+    text_column: str = "policy"
+) -> int:
+    """Append committed worker results not yet in output_path to its store and journal; return rows added.
+
+    Only shards a worker's journal has committed are merged: opening each worker's
+    results rolls back the shards a failed worker wrote but never committed, exactly
+    as resuming that worker would. dataset is needed to import a legacy CSV at output_path.
+    """
+    store, journal = open_results(output_path, dataset, text_column)
+    done = journal.completed_ids()
+    added = 0
+    for path in worker_paths:
+        if not os.path.exists(os.path.join(path, "journal.db")):
+            continue
+        worker_store, worker_journal = open_results(path)
+        worker_journal.close()
+        df = worker_store.load()
+        df = df[~df[ROW_ID].isin(done)]
+        if len(df):
+            journal.record_batch(
+                df[ROW_ID], df['correct'], store.append(df), pair_codes(df['bias_type_group'], df['predicted_bias'])
+            )
+            done.update(int(row_id) for row_id in df[ROW_ID])
+            added += len(df)
+    journal.close()
+    return added
+
+def worker_metrics(path: str) -> StreamingMetrics:
+    """Streaming metrics of one worker's committed rows, read from its journal."""
+    if not os.path.exists(os.path.join(path, "journal.db")):
+        return StreamingMetrics()
+    store, journal = open_results(path)
+    metrics = journal_metrics(journal, store)
+    journal.close()
+    return metrics
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--devices", nargs="+",
+                        help="CUDA devices assigned to workers round-robin, e.g. '0 1' (default: CPU only)")
+    parser.add_argument("--threads", type=int, help="CPU threads per worker (default: its share of the cores)")
+    parser.add_argument("--no-pin", action="store_true", help="Do not pin each worker to its own block of CPUs")
+    parser.add_argument("runner_args", nargs=argparse.REMAINDER, help="Arguments passed to qwen_runner.py")
+    args = parser.parse_args(argv)
+    runner_args = args.runner_args[1:] if args.runner_args[:1] == ["--"] else args.runner_args
+    runner = parse_runner_args(runner_args)
+
+    # Journals are cumulative across resumes, so throughput counts only this launch's rows
+    rows_before = {config: [worker_metrics(p).total for p in worker_paths(runner.output_dir, args.workers, config)]
+                   for config in runner.configs}
+
+    blocks = cpu_blocks(args.workers)
+    bind_memory = shutil.which("numactl") is not None
+    start_time = time.time()
+    processes = []
+    for i in range(args.workers):
+        device = args.devices[i % len(args.devices)] if args.devices else None
+        node, block = blocks[i]
+        threads = args.threads or (None if device is not None else len(block))
+        cpus = None if args.no_pin or device is not None else block
+        node = None if cpus is None else node
+        processes.append(start_worker(i, args.workers, runner_args, runner.output_dir, device, threads, cpus, node))
+        placement = f"device {device}" if device is not None else f"{threads} threads"
+        if cpus:
+            placement += f" on CPUs {cpus[0]}-{cpus[-1]}"
+        if node is not None:
+            placement += f", NUMA node {node}" + (" (memory bound)" if bind_memory else " (numactl not found, memory not bound)")
+        print(f"Worker {i}: pid {processes[-1].pid}, {placement}")
+
+    failed = [i for i, process in enumerate(processes) if process.wait() != 0]
+    elapsed = time.time() - start_time
+
+    # Committed rows are valid even from a failed worker, so merge before reporting failures
+    new_rows = 0
+    for config in runner.configs:
+        paths = worker_paths(runner.output_dir, args.workers, config)
+        output_path = os.path.join(runner.output_dir, config.output_name)
+        dataset = load_dataset(config, runner.data_dir)
+        added = merge_results(output_path, paths, dataset, config.text_column)
+        print(f"\n=== {config.name}: merged {added} new rows into {output_path} ===")
+        combined = StreamingMetrics()
+        for i, path in enumerate(paths):
+            metrics = worker_metrics(path)
+            combined.merge(metrics)
+            new_rows += metrics.total - rows_before[config][i]
+            print(f"Worker {i}: {metrics.total} rows, accuracy {metrics.accuracy * 100:.2f}%, "
+                  f"macro-F1 {metrics.macro_f1:.4f}")
+        print(f"Combined:\n{combined.report()}")
+        if not runner.no_report:
+            print_report(output_path)
+            if config.paired_column:
+                print(f"\n=== Perturbed report for {config.name} ===")
+                print_report(output_path, pred_column='predicted_bias_perturbed')
+                print_flip_report(output_path)
+
+    print(f"\n{args.workers} workers classified {new_rows} rows in {elapsed:.1f}s ({new_rows / elapsed:.1f} rows/s)")
+    if failed:
+        logs = ", ".join(os.path.join(worker_dir(runner.output_dir, i, args.workers), "worker.log") for i in failed)
+        sys.exit(f"Worker(s) {failed} failed; see {logs}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Streaming classification metrics built on an integer confusion matrix.
+
+Labels are coded with the result store's label categories (the bias classes plus
+'unknown'), and every batch adds to the matrix with a single np.bincount. Accuracy,
+per-class precision/recall/F1, macro-F1 and the unknown rate can be read at any
+point, and accumulators from different shards or sessions merge by adding their
+matrices, so no result file has to be re-read to know how a run is going.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bias_inference import bias_classes
+from result_store import label_dtype
+
+LABELS = list(label_dtype.categories)
+UNKNOWN = LABELS.index("unknown")
+
+def label_codes(labels: Iterable) -> np.ndarray:
+    """Category codes of labels; anything outside the label set counts as 'unknown'."""
+    codes = pd.Categorical(labels, dtype=label_dtype).codes.astype(np.int64)
+    codes[codes < 0] = UNKNOWN
+    return codes
+
+def pair_codes(true_labels: Iterable, predicted_labels: Iterable) -> np.ndarray:
+    """(true, predicted) label codes per row, as journaled by CheckpointJournal.record_batch."""
+    return np.stack([label_codes(true_labels), label_codes(predicted_labels)], axis=1)
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+class StreamingMetrics:
+    def __init__(self, counts: Optional[np.ndarray] = None):
+        n = len(LABELS)
+        self.counts = np.zeros((n, n), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[int, int, int]]) -> "StreamingMetrics":
+        """Rebuild from (true code, predicted code, count) triples such as CheckpointJournal.confusion()."""
+        metrics = cls()
+        for true_code, predicted_code, count in entries:
+            metrics.counts[true_code, predicted_code] += count
+        return metrics
+
+    def entries(self) -> List[Tuple[int, int, int]]:
+        return [(int(t), int(p), int(self.counts[t, p])) for t, p in zip(*np.nonzero(self.counts))]
+
+    def update(self, true_labels: Iterable, predicted_labels: Iterable) -> "StreamingMetrics":
+        """Add one batch of (true, predicted) labels."""
+        n = len(LABELS)
+        pairs = label_codes(true_labels) * n + label_codes(predicted_labels)
+        self.counts += np.bincount(pairs, minlength=n * n).reshape(n, n)
+        return self
+
+    def merge(self, other: "StreamingMetrics") -> "StreamingMetrics":
+        self.counts += other.counts
+        return self
+
+    def __add__(self, other: "StreamingMetrics") -> "StreamingMetrics":
+        return StreamingMetrics(self.counts + other.counts)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def accuracy(self) -> float:
+        # Rows whose true label is unknown are never correct, as in the runner's `correct` column
+        k = len(bias_classes)
+        return float(np.trace(self.counts[:k, :k]) / self.total) if self.total else 0.0
+
+    @property
+    def unknown_rate(self) -> float:
+        """Share of rows whose prediction could not be parsed into a bias class."""
+        return float(self.counts[:, UNKNOWN].sum() / self.total) if self.total else 0.0
+
+    def per_class(self) -> Dict[str, Dict[str, float]]:
+        """Precision, recall, F1 and support of each bias class."""
+        k = len(bias_classes)
+        hits = np.diag(self.counts)[:k].astype(float)
+        precision = _ratio(hits, self.counts[:, :k].sum(axis=0))
+        recall = _ratio(hits, self.counts[:k, :].sum(axis=1))
+        f1 = _ratio(2 * precision * recall, precision + recall)
+        support = self.counts[:k, :].sum(axis=1)
+        return {
+            cls: {"precision": float(precision[i]), "recall": float(recall[i]), "f1": float(f1[i]), "support": int(support[i])}
+            for i, cls in enumerate(bias_classes)
+        }
+
+    @property
+    def macro_f1(self) -> float:
+        """Unweighted mean F1 over the bias classes; 'unknown' predictions count only as misses."""
+        return float(np.mean([stats["f1"] for stats in self.per_class().values()]))
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "rows": self.total,
+            "accuracy": self.accuracy,
+            "macro_f1": self.macro_f1,
+            "unknown_rate": self.unknown_rate,
+            "per_class": self.per_class()
+        }
+
+    def report(self) -> str:
+        lines = [f"{'':>10s} {'precision':>9s} {'recall':>9s} {'f1':>9s} {'support':>9s}"]
+        for cls, stats in self.per_class().items():
+            lines.append(f"{cls:>10s} {stats['precision']:9.2f} {stats['recall']:9.2f} {stats['f1']:9.2f} {stats['support']:9d}")
+        lines.append(f"Accuracy {self.accuracy:.4f} | Macro-F1 {self.macro_f1:.4f} | "
+                     f"Unknown rate {self.unknown_rate:.4f} ({self.total} rows)")
+        return "\n".join(lines)
+
+    def confusion_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.counts, index=LABELS, columns=LABELS)
@@ -0,0 +1,215 @@
+"""Content-addressed cache of perturbed datasets.
+
+A perturbed dataset is stored as <root>/<key>.parquet, where key is a hash of the
+source file's contents, the text/ID columns, the normalized recipe, the versions of
+the operators it uses, the seed, and (for recipes with synonym substitution) the
+synonym source. Requesting the same variant again returns the stored file without
+recomputing it. A SQLite index next to the files tracks sizes and last use; once the
+cache exceeds max_bytes the least recently used datasets are deleted.
+
+    python dataset_cache.py cache/ FINAL_DATASET.csv --severity low medium high --seeds 0 1 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import perturbkit as pk
+
+INDEX = "index.db"
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class DatasetCache:
+    def __init__(self, root: str, max_bytes: int = 10 << 30):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, INDEX))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS datasets ("
+                "key TEXT PRIMARY KEY, file TEXT NOT NULL, size INTEGER NOT NULL, "
+                "last_used REAL NOT NULL, meta TEXT NOT NULL)"
+            )
+            # Source digests keyed by (path, size, mtime) so large inputs are hashed once
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, digest TEXT NOT NULL)"
+            )
+
+    def source_digest(self, path: str) -> str:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime, digest FROM sources WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+        digest = _file_digest(path)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)", (path, stat.st_size, stat.st_mtime, digest)
+            )
+        return digest
+
+    def synonym_source(self, recipe: pk.Recipe) -> Optional[str]:
+        """Identity of the synonym lookup, if the recipe uses one."""
+        if not any(name == 'synonym_substitute' for name, _ in recipe):
+            return None
+        if pk.SYNONYM_INDEX is None:
+            return "wordnet"
+        index_path = pk.SYNONYM_INDEX.path
+        return ",".join(self.source_digest(os.path.join(index_path, name)) for name in sorted(os.listdir(index_path)))
+
+    def describe(
+        self,
+        source: str,
+        recipe,
+        seed: int = 0,
+        text_column: str = "policy",
+        output_column: str = "policy_perturbed",
+        id_column: str = "row_id"
+    ) -> dict:
+        """Everything that determines the perturbed dataset; its hash is the cache key."""
+        recipe = pk.make_recipe(recipe)
+        return {
+            "source": self.source_digest(source),
+            "text_column": text_column,
+            "output_column": output_column,
+            "id_column": id_column,
+            "recipe": recipe,
+            "operator_versions": pk.recipe_versions(recipe),
+            "seed": seed,
+            "synonyms": self.synonym_source(recipe)
+        }
+
+    @staticmethod
+    def key(description: dict) -> str:
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT file FROM datasets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(self.root, row[0])
+        if not os.path.exists(path):
+            with self.conn:
+                self.conn.execute("DELETE FROM datasets WHERE key = ?", (key,))
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE datasets SET last_used = ? WHERE key = ?", (time.time(), key))
+        return path
+
+    def get(self, source: str, recipe, seed: int = 0, chunk_size: int = 10000, workers: int = 1, **columns) -> str:
+        """Path of the Parquet file for (source, recipe, seed), materializing it on a miss."""
+        description = self.describe(source, recipe, seed, **columns)
+        key = self.key(description)
+        path = self.lookup(key)
+        if path is not None:
+            return path
+
+        name = f"{key}.parquet"
+        path = os.path.join(self.root, name)
+        # A unique temporary file, so processes filling the same key never write to one file
+        fd, tmp_path = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp.parquet", dir=self.root)
+        os.close(fd)
+        try:
+            pk.perturb_file(
+                source, {"cached": (tmp_path, description["recipe"])},
+                seed=seed, chunk_size=chunk_size, workers=workers, **columns
+            )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        size = os.path.getsize(path)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?)",
+                (key, name, size, time.time(), json.dumps(description))
+            )
+        self.evict(keep=key)
+        return path
+
+    def total_bytes(self) -> int:
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM datasets").fetchone()[0]
+
+    def evict(self, target_fraction: float = 0.9, keep: Optional[str] = None):
+        """Delete least recently used datasets until the cache is below target_fraction of max_bytes."""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * target_fraction
+        victims = self.conn.execute("SELECT key, file, size FROM datasets ORDER BY last_used").fetchall()
+        with self.conn:
+            for key, name, size in victims:
+                if total <= target:
+                    break
+                if key == keep:
+                    continue
+                self.conn.execute("DELETE FROM datasets WHERE key = ?", (key,))
+                path = os.path.join(self.root, name)
+                if os.path.exists(path):
+                    os.remove(path)
+                total -= size
+
+    def entries(self) -> List[dict]:
+        rows = self.conn.execute("SELECT key, file, size, last_used, meta FROM datasets ORDER BY last_used DESC")
+        return [
+            {"key": key, "file": name, "size": size, "last_used": used, **json.loads(meta)}
+            for key, name, size, used, meta in rows
+        ]
+
+    def close(self):
+        self.conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialize perturbed datasets through the content-addressed cache.")
+    parser.add_argument("root", help="Cache directory")
+    parser.add_argument("source", help="Input .csv or .parquet")
+    parser.add_argument("--severity", nargs="+", choices=sorted(pk.SEVERITIES), default=["medium"])
+    parser.add_argument("--recipe", help="JSON file with a list of [operator, {params}] steps; replaces --severity")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--text-column", default="policy")
+    parser.add_argument("--id-column", default="row_id")
+    parser.add_argument("--max-gb", type=float, default=10.0)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--synonym-index", help="Directory written by synonym_index.py")
+    args = parser.parse_args(argv)
+
+    if args.synonym_index:
+        pk.use_synonym_index(args.synonym_index)
+    if args.recipe:
+        with open(args.recipe) as f:
+            recipes: Dict[str, pk.Recipe] = {os.path.basename(args.recipe): pk.make_recipe(json.load(f))}
+    else:
+        recipes = {name: pk.recipe_from_params(**pk.SEVERITIES[name]) for name in args.severity}
+
+    cache = DatasetCache(args.root, max_bytes=int(args.max_gb * (1 << 30)))
+    try:
+        for name, recipe in recipes.items():
+            for seed in args.seeds:
+                path = cache.get(
+                    args.source, recipe, seed,
+                    chunk_size=args.chunk_size,
+                    workers=args.workers,
+                    text_column=args.text_column,
+                    id_column=args.id_column
+                )
+                print(f"{name} seed={seed}: {path}")
+    finally:
+        cache.close()
+
+if __name__ == "__main__":
+    main()
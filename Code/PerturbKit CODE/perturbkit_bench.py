@@ -0,0 +1,215 @@
+"""Throughput benchmark for PerturbKit operators.
+
+Runs every registered operator, the seeded apply_perturbations recipe and the legacy
+global-random operators (with their original, uncached WordNet lookups) over
+synthetic length profiles (short platform sentences to long BillSum paragraphs)
+and, optionally, real excerpts from a CSV. For each (operator, profile) it reports
+chars/sec and rows/sec from the best of several timed runs, and from a separate
+tracemalloc run the peak traced memory and the blocks and bytes the call allocated
+that are still live when it returns (its output plus anything it caches).
+
+    python perturbkit_bench.py --output bench.json
+    python perturbkit_bench.py --data FINAL_DATASET.csv --compare bench.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import perturbkit as pk
+
+# Words per row as (low, high), drawn uniformly per row
+PROFILES = {
+    "sentence": (8, 40),
+    "paragraph": (80, 250),
+    "billsum": (400, 1500)
+}
+
+VOCABULARY = (
+    "the a of in to and or for policy provides financial assistance low-income families "
+    "section amended by striking inserting federal state program funding eligible individuals "
+    "shall secretary act public health education tax credit veterans children housing rights"
+).split()
+
+def synthetic_texts(profile: str, rows: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    low, high = PROFILES[profile]
+    lengths = rng.integers(low, high + 1, size=rows)
+    vocabulary = np.array(VOCABULARY)
+    return [' '.join(vocabulary[rng.integers(0, len(vocabulary), size=n)]) for n in lengths]
+
+def legacy_synonym_substitute(text: str, p: float = 0.1) -> str:
+    """synonym_substitute as it was before lookups were cached: one WordNet query per hit."""
+    wordnet = pk.backend('wordnet')
+    def get_syn(w):
+        synsets = wordnet.synsets(w)
+        lemmas = [l.name().replace('_',' ') for s in synsets for l in s.lemmas()]
+        lemmas = [l for l in set(lemmas) if l.lower() != w.lower()]
+        return random.choice(lemmas) if lemmas else w
+
+    return ' '.join(get_syn(w) if random.random() < p else w for w in text.split())
+
+def legacy_apply_perturbations(text: str) -> str:
+    """apply_perturbations with the uncached synonym lookup."""
+    t = pk.typo_noise(text)
+    t = pk.whitespace_alter(t)
+    t = pk.gibberish_prefix(t)
+    t = pk.word_shuffling(t)
+    t = legacy_synonym_substitute(t)
+    return pk.prompt_injection(t)
+
+def benchmark_cases(seed: int = 0) -> Dict[str, Callable[[List[str]], list]]:
+    """Name -> function perturbing a list of texts."""
+    cases = {}
+    for name in pk.OPERATORS:
+        cases[name] = lambda texts, name=name: pk.apply_perturbations_batch(texts, seed=seed, recipe=[name])
+    cases["apply_perturbations_rng"] = lambda texts: pk.apply_perturbations_batch(texts, seed=seed)
+    legacy = {
+        "typo_noise": pk.typo_noise,
+        "whitespace_alter": pk.whitespace_alter,
+        "gibberish_prefix": pk.gibberish_prefix,
+        "word_shuffling": pk.word_shuffling,
+        "synonym_substitute": legacy_synonym_substitute,
+        "prompt_injection": pk.prompt_injection,
+        "apply_perturbations": legacy_apply_perturbations
+    }
+    for name, fn in legacy.items():
+        cases[f"legacy:{name}"] = lambda texts, fn=fn: [fn(t) for t in texts]
+    return cases
+
+def measure(fn: Callable[[List[str]], list], texts: List[str], repeats: int = 3) -> dict:
+    chars = sum(len(t) for t in texts)
+    fn(texts[:10])  # warm caches and lazy backends outside the timed runs
+    seconds = min(_timed(fn, texts) for _ in range(repeats))
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    result = fn(texts)
+    peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+    # Compared while result is alive, so its blocks count as allocations of the call
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    alloc_blocks = sum(stat.count_diff for stat in diff)
+    alloc_bytes = sum(stat.size_diff for stat in diff)
+
+    return {
+        "rows": len(texts),
+        "chars": chars,
+        "seconds": seconds,
+        "chars_per_sec": chars / seconds if seconds else None,
+        "rows_per_sec": len(texts) / seconds if seconds else None,
+        "peak_bytes": peak_bytes,
+        "peak_bytes_per_row": peak_bytes / len(texts) if texts else None,
+        "alloc_blocks": alloc_blocks,
+        "alloc_bytes": alloc_bytes,
+        "alloc_blocks_per_row": alloc_blocks / len(texts) if texts else None
+    }
+
+def _timed(fn, texts) -> float:
+    start = time.perf_counter()
+    fn(texts)
+    return time.perf_counter() - start
+
+def run_benchmarks(
+    profiles: Dict[str, List[str]],
+    operators: Optional[List[str]] = None,
+    repeats: int = 3,
+    seed: int = 0
+) -> List[dict]:
+    cases = benchmark_cases(seed)
+    unknown = [name for name in operators or [] if name not in cases]
+    if unknown:
+        raise ValueError(f"Unknown benchmark case(s) {unknown}; choose from: {', '.join(cases)}")
+    results = []
+    for name in operators or cases:
+        for profile, texts in profiles.items():
+            record = {"operator": name, "profile": profile}
+            op = pk.OPERATORS.get(name)
+            if op is not None:
+                record["declared_cost"] = op.cost
+            try:
+                record.update(measure(cases[name], texts, repeats))
+            except LookupError as e:
+                # Missing corpora (e.g. WordNet) are reported instead of aborting the run
+                lines = [line.strip() for line in str(e).splitlines() if line.strip().strip('*')]
+                record["error"] = lines[0] if lines else type(e).__name__
+            results.append(record)
+            if "error" in record:
+                print(f"{name:32s} {profile:10s} skipped: {record['error']}")
+            else:
+                print(f"{name:32s} {profile:10s} {record['chars_per_sec']:>14,.0f} chars/s "
+                      f"{record['rows_per_sec']:>10,.0f} rows/s {record['peak_bytes'] / 1024:>10,.0f} KiB peak "
+                      f"{record['alloc_blocks']:>9,d} blocks {record['alloc_bytes'] / 1024:>9,.0f} KiB allocated")
+    return results
+
+def compare(results: List[dict], baseline_path: str, threshold: float = 0.9):
+    """Print throughput relative to a saved run and flag drops below threshold."""
+    with open(baseline_path) as f:
+        baseline = {(r["operator"], r["profile"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path}:")
+    for record in results:
+        old = baseline.get((record["operator"], record["profile"]))
+        if old is None or not old.get("chars_per_sec") or not record.get("chars_per_sec"):
+            continue
+        ratio = record["chars_per_sec"] / old["chars_per_sec"]
+        flag = "  REGRESSION" if ratio < threshold else ""
+        print(f"{record['operator']:32s} {record['profile']:10s} {ratio:6.2f}x{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PerturbKit operator throughput.")
+    parser.add_argument("--rows", type=int, default=500, help="Rows per synthetic profile")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(PROFILES), default=list(PROFILES))
+    parser.add_argument("--data", help="CSV of real excerpts to add as the 'data' profile")
+    parser.add_argument("--text-column", default="policy")
+    parser.add_argument("--operators", nargs="+", help="Benchmark only these cases")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--synonym-index", help="Directory written by synonym_index.py")
+    parser.add_argument("--output", default="perturbkit_bench.json")
+    parser.add_argument("--compare", help="Earlier benchmark JSON to compare against")
+    args = parser.parse_args(argv)
+
+    cases = benchmark_cases(args.seed)
+    unknown = [name for name in args.operators or [] if name not in cases]
+    if unknown:
+        parser.error(f"unknown --operators {' '.join(unknown)}; choose from: {' '.join(cases)}")
+    if args.synonym_index:
+        pk.use_synonym_index(args.synonym_index)
+    profiles = {name: synthetic_texts(name, args.rows, args.seed) for name in args.profiles}
+    if args.data:
+        import pandas as pd
+        texts = pd.read_csv(args.data, usecols=[args.text_column])[args.text_column].dropna()
+        profiles["data"] = texts.astype(str).tolist()
+
+    results = run_benchmarks(profiles, args.operators, args.repeats, args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "rows": {name: len(texts) for name, texts in profiles.items()},
+            "synonym_index": args.synonym_index
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Saved {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Precomputed WordNet synonym index for PerturbKit's synonym substitution.
+
+The index is built once from WordNet and saved as a directory of .npy arrays:
+two string tables (lookup words and synonym lemmas, each a UTF-8 blob plus
+offsets) and a CSR-style mapping from each word to its synonyms, with a POS
+bitmask per synonym. Opening an index memory-maps the arrays, so loading is
+instant and lookups are a binary search over the sorted words.
+
+Build it from the words of a dataset to get exactly what wordnet.synsets() gives
+for those tokens (inflected forms included), or from every WordNet lemma name.
+Words outside the indexed vocabulary, such as tokens mangled by an earlier typo
+operator, have no synonyms. For example:
+
+    python synonym_index.py synonyms/ --vocabulary-csv FINAL_DATASET.csv --text-column policy
+"""
+
+import argparse
+import bisect
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+# Satellite adjectives ('s') are folded into 'a'
+POS_BITS = {'n': 1, 'v': 2, 'a': 4, 's': 4, 'r': 8}
+META = "meta.json"
+ARRAYS = ["word_blob", "word_offsets", "lemma_blob", "lemma_offsets", "syn_offsets", "syn_ids", "syn_pos"]
+
+class StringTable:
+    """Read-only sequence of strings stored as one UTF-8 blob plus offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i+1]]).decode('utf-8')
+
+    @staticmethod
+    def pack(strings) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [s.encode('utf-8') for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+class SynonymIndex:
+    def __init__(self, path: str, cache_size: int = 65536):
+        self.path = path
+        with open(os.path.join(path, META)) as f:
+            self.meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ARRAYS}
+        self.words = StringTable(arrays["word_blob"], arrays["word_offsets"])
+        self.lemmas = StringTable(arrays["lemma_blob"], arrays["lemma_offsets"])
+        self.syn_offsets = arrays["syn_offsets"]
+        self.syn_ids = arrays["syn_ids"]
+        self.syn_pos = arrays["syn_pos"]
+        # Hot words (function words, domain terms) are answered from memory
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _lookup(self, word: str, pos: Optional[str] = None) -> Tuple[str, ...]:
+        """Sorted synonyms of word (case-insensitive), optionally limited to one WordNet POS."""
+        key = word.lower()
+        i = bisect.bisect_left(self.words, key)
+        if i == len(self.words) or self.words[i] != key:
+            return ()
+        start, end = int(self.syn_offsets[i]), int(self.syn_offsets[i+1])
+        ids = self.syn_ids[start:end]
+        if pos is not None:
+            ids = ids[(self.syn_pos[start:end] & POS_BITS[pos]) != 0]
+        return tuple(self.lemmas[j] for j in ids)
+
+    def cache_info(self):
+        return self.lookup.cache_info()
+
+def wordnet_synonyms(wordnet, word: str) -> Dict[str, int]:
+    """Synonym -> POS bitmask for word, using the same lemma filtering as synonym_substitute."""
+    key = word.lower()
+    found = {}
+    for s in wordnet.synsets(key):
+        bit = POS_BITS[s.pos()]
+        for l in s.lemmas():
+            name = l.name().replace('_',' ')
+            if name.lower() != key:
+                found[name] = found.get(name, 0) | bit
+    return found
+
+def build_synonym_index(path: str, vocabulary: Optional[Iterable[str]] = None, wordnet=None) -> SynonymIndex:
+    """Write an index for vocabulary (default: every WordNet lemma name) to path and open it."""
+    if wordnet is None:
+        from nltk.corpus import wordnet
+    if vocabulary is None:
+        # Text is split on whitespace, so multi-word lemmas can never be looked up
+        vocabulary = (name for name in wordnet.all_lemma_names() if '_' not in name)
+
+    words, lemma_ids, syn_offsets, syn_ids, syn_pos = [], {}, [0], [], []
+    for word in sorted({w.lower() for w in vocabulary}):
+        synonyms = wordnet_synonyms(wordnet, word)
+        if not synonyms:
+            continue
+        words.append(word)
+        for name in sorted(synonyms):
+            syn_ids.append(lemma_ids.setdefault(name, len(lemma_ids)))
+            syn_pos.append(synonyms[name])
+        syn_offsets.append(len(syn_ids))
+
+    word_blob, word_offsets = StringTable.pack(words)
+    lemma_blob, lemma_offsets = StringTable.pack(lemma_ids)
+    arrays = {
+        "word_blob": word_blob,
+        "word_offsets": word_offsets,
+        "lemma_blob": lemma_blob,
+        "lemma_offsets": lemma_offsets,
+        "syn_offsets": np.asarray(syn_offsets, dtype=np.uint64),
+        "syn_ids": np.asarray(syn_ids, dtype=np.uint32),
+        "syn_pos": np.asarray(syn_pos, dtype=np.uint8)
+    }
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+    with open(os.path.join(path, META), "w") as f:
+        json.dump({"version": 1, "words": len(words), "lemmas": len(lemma_ids), "synonyms": len(syn_ids)}, f, indent=1)
+    return SynonymIndex(path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a synonym index for PerturbKit from WordNet.")
+    parser.add_argument("output", help="Directory to write the index to")
+    parser.add_argument("--vocabulary-csv", help="Index only the words of this CSV (default: all WordNet lemmas)")
+    parser.add_argument("--text-column", default="policy", help="Text column of --vocabulary-csv")
+    args = parser.parse_args(argv)
+
+    vocabulary = None
+    if args.vocabulary_csv:
+        import pandas as pd
+        texts = pd.read_csv(args.vocabulary_csv, usecols=[args.text_column])[args.text_column].dropna()
+        vocabulary = {w for text in texts.astype(str) for w in text.split()}
+    index = build_synonym_index(args.output, vocabulary)
+    print(f"Indexed {index.meta['words']} words, {index.meta['synonyms']} synonyms -> {args.output}")
+
+if __name__ == "__main__":
+    main()
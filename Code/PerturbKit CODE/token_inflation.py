@@ -0,0 +1,146 @@
+"""Token-inflation accounting for PerturbKit recipes.
+
+For every row, records the token count of the clean text and of the text after each
+recipe step, under a given (fast) tokenizer, so the marginal inflation of each
+operator can be read off directly. Texts are tokenized in batches. The per-row table
+(row_id, tokens_clean, tokens_<step>..., tokens_perturbed) is written as Parquet and
+a dataset-level summary as JSON:
+
+    python token_inflation.py FINAL_DATASET.csv --tokenizer Qwen/Qwen2.5-7B-Instruct \
+        --severity medium --output inflation.parquet --summary inflation.json
+"""
+
+import argparse
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import perturbkit as pk
+
+def load_tokenizer(name: str):
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(name, use_fast=True)
+    if not tokenizer.is_fast:
+        print(f"Warning: no fast tokenizer for {name}; counting will be slow")
+    return tokenizer
+
+def token_counts(tokenizer, texts: Sequence[str], batch_size: int = 1024) -> np.ndarray:
+    """Number of tokens in each text, without special tokens."""
+    counts = np.zeros(len(texts), dtype=np.int64)
+    for start in range(0, len(texts), batch_size):
+        batch = [t if isinstance(t, str) else "" for t in texts[start:start + batch_size]]
+        encoded = tokenizer(batch, add_special_tokens=False, return_attention_mask=False)["input_ids"]
+        counts[start:start + len(batch)] = [len(ids) for ids in encoded]
+    return counts
+
+def inflation_table(
+    tokenizer,
+    texts: Sequence[str],
+    row_ids: Sequence[int],
+    recipe: pk.Recipe,
+    seed: int = 0,
+    batch_size: int = 1024
+) -> pd.DataFrame:
+    """Per-row token counts before perturbation and after every recipe step."""
+    labels = pk.step_labels(recipe)
+    rows = [i for i, t in enumerate(texts) if isinstance(t, str)]
+    stages = [list(texts) for _ in recipe]
+    for stage, perturbed in zip(stages, pk.recipe_stages([texts[i] for i in rows], [int(row_ids[i]) for i in rows], recipe, seed)):
+        for i, t in zip(rows, perturbed):
+            stage[i] = t
+    table = {"row_id": np.asarray(row_ids, dtype=np.int64), "tokens_clean": token_counts(tokenizer, texts, batch_size)}
+    for i, label in enumerate(labels):
+        table[f"tokens_{label}"] = token_counts(tokenizer, stages[i], batch_size)
+    table["tokens_perturbed"] = table[f"tokens_{labels[-1]}"] if labels else table["tokens_clean"]
+    return pd.DataFrame(table)
+
+def summarize(df: pd.DataFrame, labels: List[str], count_over: Optional[int] = None) -> Dict[str, object]:
+    """Dataset totals plus the distribution of each step's marginal token change.
+
+    With count_over, also reports how many rows have more perturbed tokens than that.
+    """
+    clean = df["tokens_clean"].to_numpy()
+    perturbed = df["tokens_perturbed"].to_numpy()
+    summary = {
+        "rows": len(df),
+        "tokens_clean": int(clean.sum()),
+        "tokens_perturbed": int(perturbed.sum()),
+        "inflation": float(perturbed.sum() / clean.sum()) if clean.sum() else None,
+        "perturbed_p50": float(np.percentile(perturbed, 50)) if len(df) else None,
+        "perturbed_p95": float(np.percentile(perturbed, 95)) if len(df) else None,
+        "perturbed_max": int(perturbed.max()) if len(df) else None,
+        "operators": {}
+    }
+    if count_over is not None:
+        summary["count_over"] = count_over
+        summary["rows_over"] = int((perturbed > count_over).sum())
+    previous = clean
+    for label in labels:
+        current = df[f"tokens_{label}"].to_numpy()
+        delta = current - previous
+        summary["operators"][label] = {
+            "added_tokens": int(delta.sum()),
+            "mean_delta": float(delta.mean()) if len(df) else None,
+            "p95_delta": float(np.percentile(delta, 95)) if len(df) else None,
+            "ratio": float(current.sum() / previous.sum()) if previous.sum() else None
+        }
+        previous = current
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how much a PerturbKit recipe inflates token counts.")
+    parser.add_argument("input", help="Input .csv or .parquet")
+    parser.add_argument("--tokenizer", default="Qwen/Qwen2.5-7B-Instruct")
+    parser.add_argument("--severity", choices=sorted(pk.SEVERITIES), default="medium")
+    parser.add_argument("--recipe", help="JSON file with a list of [operator, {params}] steps; replaces --severity")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--text-column", default="policy")
+    parser.add_argument("--id-column", default="row_id")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1024, help="Texts per tokenizer call")
+    parser.add_argument("--count-over", type=int, metavar="TOKENS",
+                        help="Also count rows whose perturbed text has more than TOKENS tokens (no text is truncated)")
+    parser.add_argument("--synonym-index", help="Directory written by synonym_index.py")
+    parser.add_argument("--output", default="token_inflation.parquet")
+    parser.add_argument("--summary", default="token_inflation.json")
+    args = parser.parse_args(argv)
+
+    if args.synonym_index:
+        pk.use_synonym_index(args.synonym_index)
+    if args.recipe:
+        with open(args.recipe) as f:
+            recipe = pk.make_recipe(json.load(f))
+    else:
+        recipe = pk.recipe_from_params(**pk.SEVERITIES[args.severity])
+    tokenizer = load_tokenizer(args.tokenizer)
+
+    tables, rows = [], 0
+    for chunk in pk.iter_chunks(args.input, args.chunk_size):
+        if args.id_column in chunk.columns:
+            row_ids = chunk[args.id_column].astype(int).tolist()
+        else:
+            row_ids = list(range(rows, rows + len(chunk)))
+        tables.append(inflation_table(tokenizer, chunk[args.text_column].tolist(), row_ids, recipe, args.seed, args.batch_size))
+        rows += len(chunk)
+        print(f"Counted {rows} rows", end="\r")
+    print()
+
+    df = pd.concat(tables, ignore_index=True)
+    df.to_parquet(args.output, index=False)
+    summary = summarize(df, pk.step_labels(recipe), args.count_over)
+    summary.update({"tokenizer": args.tokenizer, "seed": args.seed, "recipe": recipe})
+    with open(args.summary, "w") as f:
+        json.dump(summary, f, indent=1)
+
+    print(f"Tokens: {summary['tokens_clean']} clean -> {summary['tokens_perturbed']} perturbed "
+          f"({summary['inflation']:.2f}x)")
+    for label, stats in summary["operators"].items():
+        print(f"  {label:24s} {stats['added_tokens']:+10d} tokens ({stats['ratio']:.2f}x)")
+    if args.count_over is not None:
+        print(f"Rows over {args.count_over} tokens after perturbation: {summary['rows_over']}")
+    print(f"Saved {args.output} and {args.summary}")
+
+if __name__ == "__main__":
+    main()